@@ -1,13 +1,17 @@
 from http import HTTPStatus
 from typing import Annotated
+from uuid import UUID
 
-from fastapi import APIRouter, Depends
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, Body, Depends, Header, Query, Response
 from fastapi.security import OAuth2PasswordRequestForm
 
-from models.users import User
+from schemas.permissions import PermissionCheck, PermissionCheckResult
+from schemas.sessions import SessionInfo
 from schemas.users import UserResponseData, UserSignUp
-from services.auth import Token, AuthServiceDep
+from services.auth import Principal, Token, AuthServiceDep, \
+    ForwardAuthServiceDep, PrincipalDep, oauth2_scheme
+from services.exceptions import permission_denied
+from services.permissions import PermissionService, PermissionServiceDep
 
 router = APIRouter()
 
@@ -19,10 +23,7 @@ router = APIRouter()
              response_description="id, email, hashed password")
 async def create_user(user_create: UserSignUp,
                       auth_service: AuthServiceDep) -> UserResponseData:
-    new_user_data = jsonable_encoder(user_create)
-    new_user = User(**new_user_data)
-    await auth_service.create_user(new_user)
-    return new_user
+    return await auth_service.create_user(user_create)
 
 
 @router.post("/login",
@@ -31,18 +32,50 @@ async def create_user(user_create: UserSignUp,
              description="Вход в аккаунт существующего пользователя")
 async def login_for_access_token(
         form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-        auth_service: AuthServiceDep) -> Token:
+        auth_service: AuthServiceDep,
+        user_agent: Annotated[str | None, Header()] = None) -> Token:
     token = await auth_service.login(form_data.username,
-                                     form_data.password)
+                                     form_data.password,
+                                     source=user_agent and user_agent[:255])
     return token
 
 
 @router.post("/logout",
              description="Выход пользователя из аккаунта",
              status_code=HTTPStatus.OK)
-async def logout(token: str, auth_service: AuthServiceDep) -> None:
-    token = await auth_service.check_access_token(token)
-    await auth_service.add_invalid_access_token_to_cache(token)
+async def logout(token: Annotated[str, Depends(oauth2_scheme)],
+                 principal: PrincipalDep,
+                 auth_service: AuthServiceDep) -> None:
+    await auth_service.revoke_access_token(token, principal)
+
+
+@router.post("/logout-others",
+             response_model=Token,
+             description="Выйти из остальных аккаунтов: все выданные токены "
+                         "пользователя отзываются, текущая сессия получает "
+                         "новую пару токенов",
+             status_code=HTTPStatus.OK)
+async def logout_others(principal: PrincipalDep,
+                        auth_service: AuthServiceDep) -> Token:
+    return await auth_service.logout_other_sessions(principal)
+
+
+@router.get("/sessions",
+            response_model=list[SessionInfo],
+            description="Активные сессии пользователя",
+            status_code=HTTPStatus.OK)
+async def get_sessions(principal: PrincipalDep,
+                       auth_service: AuthServiceDep) -> list[SessionInfo]:
+    return await auth_service.get_sessions(principal)
+
+
+@router.delete("/sessions/{session_id}",
+               description="Завершить сессию пользователя",
+               status_code=HTTPStatus.NO_CONTENT)
+async def delete_session(session_id: str,
+                         principal: PrincipalDep,
+                         auth_service: AuthServiceDep) -> None:
+    await auth_service.delete_session(principal, session_id)
 
 
 @router.post("/refresh",
@@ -52,3 +85,74 @@ async def logout(token: str, auth_service: AuthServiceDep) -> None:
 async def refresh(token: str, auth_service: AuthServiceDep) -> Token:
     token = await auth_service.refresh_access_token(token)
     return token
+
+
+@router.get("/verify",
+            response_class=Response,
+            description="Проверка access-токена для nginx auth_request: "
+                        "204 с заголовками X-User-Id и X-User-Permissions "
+                        "или 401, тело ответа пустое",
+            status_code=HTTPStatus.NO_CONTENT)
+async def verify(
+        auth_service: ForwardAuthServiceDep,
+        authorization: Annotated[str | None, Header()] = None) -> Response:
+    effective = await auth_service.verify_request(authorization)
+    if effective is None:
+        return Response(status_code=HTTPStatus.UNAUTHORIZED,
+                        headers={'WWW-Authenticate': 'Bearer'})
+
+    return Response(status_code=HTTPStatus.NO_CONTENT, headers={
+        'X-User-Id': str(effective.user_id),
+        'X-User-Permissions': str(effective.permissions),
+        'X-User-Superuser': str(int(effective.is_superuser)),
+    })
+
+
+async def ensure_can_check(principal: Principal, user_ids: set[UUID],
+                           permission_service: PermissionService) -> None:
+    if user_ids - {principal.user_id} and not (
+        await permission_service.get_permissions(principal.user_id)
+    ).is_superuser:
+        raise permission_denied
+
+
+@router.get("/check",
+            response_model=PermissionCheckResult,
+            description="Проверить наличие прав у пользователя: "
+                        "свои права может проверить любой, чужие - "
+                        "суперпользователь",
+            status_code=HTTPStatus.OK)
+async def check_permissions(
+        user_id: UUID, permissions: Annotated[int, Query(ge=0)],
+        principal: PrincipalDep,
+        permission_service: PermissionServiceDep) -> PermissionCheckResult:
+    await ensure_can_check(principal, {user_id}, permission_service)
+    effective = await permission_service.get_permissions(user_id)
+    return PermissionCheckResult(user_id=user_id,
+                                 permissions=permissions,
+                                 allowed=effective.allows(permissions))
+
+
+@router.post("/check/batch",
+             response_model=list[PermissionCheckResult],
+             description="Проверить наличие прав у нескольких "
+                         "пользователей; чужие права - только суперпользователь",
+             status_code=HTTPStatus.OK)
+async def check_permissions_batch(
+        checks: Annotated[list[PermissionCheck], Body(max_length=1000)],
+        principal: PrincipalDep,
+        permission_service: PermissionServiceDep
+) -> list[PermissionCheckResult]:
+    await ensure_can_check(principal, {check.user_id for check in checks},
+                           permission_service)
+    effective = await permission_service.get_many(
+        [check.user_id for check in checks]
+    )
+    return [
+        PermissionCheckResult(
+            user_id=check.user_id,
+            permissions=check.permissions,
+            allowed=effective[check.user_id].allows(check.permissions),
+        )
+        for check in checks
+    ]
@@ -0,0 +1,44 @@
+import resource
+from http import HTTPStatus
+
+from fastapi import APIRouter
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from db.postgres import engine, replica_engines
+from services.auth import AuthService, verified_tokens
+from services.catalog import roles_catalog
+from services.history import history_writer
+from services.passwords import password_hasher
+from services.revocation import revoked_tokens
+
+router = APIRouter()
+
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    return {
+        'size': engine.pool.size(),
+        'checked_out': engine.pool.checkedout(),
+        'overflow': engine.pool.overflow(),
+    }
+
+
+@router.get(
+    "/",
+    summary="Метрики воркера",
+    description="Счётчики внутренних кешей и очередей текущего воркера",
+    status_code=HTTPStatus.OK
+)
+async def get_metrics() -> dict:
+    return {
+        'token_cache': verified_tokens.stats(),
+        'token_decodes': AuthService.decode_count,
+        'password_hasher': password_hasher.stats(),
+        'revoked_tokens': revoked_tokens.stats(),
+        'login_history': history_writer.stats(),
+        'roles_catalog': roles_catalog.stats(),
+        'db_pool': pool_stats(engine),
+        'db_replica_pools': [pool_stats(replica) for replica in replica_engines],
+        'process': {
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+    }
@@ -1,11 +1,18 @@
 from http import HTTPStatus
 from uuid import UUID
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import StreamingResponse
 
-from schemas.roles import RoleInDB, RoleCreate
-from services.auth import AuthServiceDep
+from schemas.roles import AddRoleBulk, RoleInDB, RoleCreate
+from services.auth import PrincipalDep
+from services.etags import is_not_modified, make_etag, \
+    not_modified_response, set_cache_headers
+from services.exceptions import permission_denied
+from services.export import EXPORT_MEDIA_TYPES, ndjson_lines
+from services.permissions import PermissionServiceDep
 from services.roles import RoleServiceDep
+from services.users import UserServiceDep
 
 
 router = APIRouter()
@@ -15,16 +22,22 @@ router = APIRouter()
     "/",
     summary="Получить роли",
     response_model=list[RoleInDB],
-    description="Получить список всех ролей",
+    description="Получить список всех ролей. Ответ помечается ETag, "
+                "при совпадении If-None-Match возвращается 304",
     status_code=HTTPStatus.OK
 )
 async def get_all_roles(
-    token: str,
-    auth_service: AuthServiceDep,
+    request: Request, response: Response,
+    principal: PrincipalDep,
     role_service: RoleServiceDep
 ) -> list[RoleInDB]:
-    await auth_service.check_access_token(token)
-    return await role_service.get_roles()
+    catalog = await role_service.get_catalog()
+    etag = make_etag('roles', catalog.etag)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    set_cache_headers(response, etag)
+    return list(catalog.roles)
 
 
 @router.post(
@@ -35,11 +48,10 @@ async def get_all_roles(
     status_code=HTTPStatus.CREATED
 )
 async def create_role(
-    role: RoleCreate, token: str,
-    auth_service: AuthServiceDep,
+    role: RoleCreate,
+    principal: PrincipalDep,
     role_service: RoleServiceDep
 ) -> RoleInDB:
-    await auth_service.check_access_token(token)
     return await role_service.create_role(role.title, role.permissions)
 
 
@@ -50,11 +62,10 @@ async def create_role(
     status_code=HTTPStatus.OK
 )
 async def update_role(
-    role_id: UUID, role: RoleCreate, token: str,
-    auth_service: AuthServiceDep,
+    role_id: UUID, role: RoleCreate,
+    principal: PrincipalDep,
     role_service: RoleServiceDep
 ) -> RoleInDB:
-    await auth_service.check_access_token(token)
     return await role_service.update_role(role_id, role.title, role.permissions)
 
 
@@ -65,9 +76,33 @@ async def update_role(
     status_code=HTTPStatus.NO_CONTENT
 )
 async def delete_role(
-    role_id: UUID, token: str,
-    auth_service: AuthServiceDep,
+    role_id: UUID,
+    principal: PrincipalDep,
     role_service: RoleServiceDep
 ) -> None:
-    await auth_service.check_access_token(token)
     await role_service.delete_role(role_id)
+
+
+@router.post(
+    "/{role_id}/users/",
+    summary="Назначить роль пользователям",
+    description="Назначить роль списку пользователей. Прогресс отдаётся "
+                "потоком NDJSON после каждой порции; несуществующие "
+                "пользователи пропускаются. Доступно суперпользователю",
+    response_class=StreamingResponse,
+    status_code=HTTPStatus.OK
+)
+async def add_role_bulk(
+    role_id: UUID, users: AddRoleBulk,
+    principal: PrincipalDep,
+    user_service: UserServiceDep,
+    permission_service: PermissionServiceDep
+) -> StreamingResponse:
+    if not (
+        await permission_service.get_permissions(principal.user_id)
+    ).is_superuser:
+        raise permission_denied
+
+    progress = await user_service.add_role_bulk(role_id, users.user_ids)
+    return StreamingResponse(ndjson_lines(progress),
+                             media_type=EXPORT_MEDIA_TYPES['ndjson'])
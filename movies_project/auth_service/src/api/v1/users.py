@@ -1,16 +1,23 @@
+from datetime import datetime
 from http import HTTPStatus
+from typing import Literal
 from uuid import UUID
 
-from fastapi import APIRouter
-from fastapi_pagination import Page
+from fastapi import APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 from schemas.roles import RoleInDB, AddRole
 from schemas.users import (
     UserResponseData, UserForUpdate,
-    UserHistory,
+    UserHistoryPage,
 )
-from services.auth import AuthServiceDep
-from services.users import UserServiceDep
+from services.auth import PrincipalDep
+from services.etags import is_not_modified, not_modified_response, \
+    set_cache_headers
+from services.export import EXPORT_MEDIA_TYPES, gzip_stream, to_csv, \
+    to_naive_utc, to_ndjson
+from services.permissions import PermissionServiceDep
+from services.users import HISTORY_EXPORT_COLUMNS, UserServiceDep
 from services.exceptions import (
     wrong_username_or_password_exception,
     permission_denied,
@@ -40,37 +47,89 @@ async def update_credentials(user: UserForUpdate,
 @router.get(
     "/{user_id}/auth-history/",
     summary="История входов пользователя",
-    response_model=Page[UserHistory],
-    description="Получить историю входов пользователя",
+    response_model=UserHistoryPage,
+    description="Получить историю входов пользователя, начиная с последних. "
+                "Следующая страница запрашивается с cursor из next_cursor",
     status_code=HTTPStatus.OK
 )
-async def get_auth_history(user_id: UUID, token: str,
+async def get_auth_history(user_id: UUID, principal: PrincipalDep,
                            user_service: UserServiceDep,
-                           auth_service: AuthServiceDep
-                           ) -> list[UserHistory]:
-    token = await auth_service.check_access_token(token)
-    if await auth_service.get_user_id_from_token(token) != user_id:
+                           size: int = Query(50, ge=1, le=100),
+                           cursor: str | None = None,
+                           with_total: bool = False
+                           ) -> UserHistoryPage:
+    if principal.user_id != user_id:
         raise permission_denied
 
-    history_list = await user_service.get_paginated_history(user_id)
-    return history_list
+    history_page = await user_service.get_paginated_history(
+        user_id, size, cursor, with_total
+    )
+    return history_page
+
+
+@router.get(
+    "/{user_id}/auth-history/export/",
+    summary="Выгрузка истории входов пользователя",
+    description="Выгрузить всю историю входов пользователя потоком в NDJSON "
+                "или CSV, от старых записей к новым. Пользователь может "
+                "выгрузить свою историю, суперпользователь - любую",
+    response_class=StreamingResponse,
+    status_code=HTTPStatus.OK
+)
+async def export_auth_history(
+        user_id: UUID, principal: PrincipalDep,
+        user_service: UserServiceDep,
+        permission_service: PermissionServiceDep,
+        export_format: Literal['ndjson', 'csv'] = Query('ndjson', alias='format'),
+        since: datetime | None = None,
+        until: datetime | None = None,
+        gzip: bool = False
+) -> StreamingResponse:
+    if principal.user_id != user_id and not (
+        await permission_service.get_permissions(principal.user_id)
+    ).is_superuser:
+        raise permission_denied
+
+    chunks = user_service.stream_history(user_id, to_naive_utc(since),
+                                         to_naive_utc(until))
+    if export_format == 'csv':
+        body = to_csv(chunks, [column.key for column in HISTORY_EXPORT_COLUMNS])
+    else:
+        body = to_ndjson(chunks)
+
+    headers = {
+        'Content-Disposition':
+            f'attachment; filename="auth-history-{user_id}.{export_format}"',
+    }
+    if gzip:
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[export_format],
+                             headers=headers)
 
 
 @router.get(
     "/{user_id}/roles/",
     summary="Роль пользователя",
     response_model=RoleInDB | None,
-    description="Получить текущую роль пользователя",
+    description="Получить текущую роль пользователя. Ответ помечается "
+                "ETag, при совпадении If-None-Match возвращается 304",
     status_code=HTTPStatus.OK
 )
-async def get_user_roles(user_id: UUID, token: str,
+async def get_user_roles(user_id: UUID, principal: PrincipalDep,
+                         request: Request, response: Response,
                          user_service: UserServiceDep,
-                         auth_service: AuthServiceDep
+                         permission_service: PermissionServiceDep
                          ) -> RoleInDB | None:
-    token = await auth_service.check_access_token(token)
-    if await auth_service.get_user_id_from_token(token) != user_id:
+    if principal.user_id != user_id:
         raise permission_denied
 
+    permissions = await permission_service.get_permissions(user_id)
+    etag = await user_service.get_role_etag(permissions)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    set_cache_headers(response, etag)
     role = await user_service.get_role(user_id)
     return role
 
@@ -81,11 +140,10 @@ async def get_user_roles(user_id: UUID, token: str,
     description="Установить роль пользователю",
     status_code=HTTPStatus.NO_CONTENT
 )
-async def add_user_role(user_id: UUID, role: AddRole, token: str,
-                        user_service: UserServiceDep,
-                        auth_service: AuthServiceDep) -> None:
-    token = await auth_service.check_access_token(token)
-    if await auth_service.get_user_id_from_token(token) != user_id:
+async def add_user_role(user_id: UUID, role: AddRole,
+                        principal: PrincipalDep,
+                        user_service: UserServiceDep) -> None:
+    if principal.user_id != user_id:
         raise permission_denied
 
     await user_service.add_role(user_id, role.role_id)
@@ -97,11 +155,9 @@ async def add_user_role(user_id: UUID, role: AddRole, token: str,
     description="Удалить роль пользователя",
     status_code=HTTPStatus.NO_CONTENT
 )
-async def remove_user_role(user_id: UUID, token: str,
-                           user_service: UserServiceDep,
-                           auth_service: AuthServiceDep) -> None:
-    token = await auth_service.check_access_token(token)
-    if await auth_service.get_user_id_from_token(token) != user_id:
+async def remove_user_role(user_id: UUID, principal: PrincipalDep,
+                           user_service: UserServiceDep) -> None:
+    if principal.user_id != user_id:
         raise permission_denied
 
     await user_service.remove_role(user_id)
@@ -0,0 +1,22 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+
+from core.config import config
+from services.keys import access_keys
+
+router = APIRouter()
+
+
+@router.get(
+    "/jwks.json",
+    summary="Публичные ключи",
+    description="JWKS для локальной проверки access-токенов другими сервисами",
+    status_code=HTTPStatus.OK
+)
+async def get_jwks() -> ORJSONResponse:
+    return ORJSONResponse(
+        access_keys.jwks,
+        headers={'Cache-Control': f'public, max-age={config.jwks_max_age}'},
+    )
@@ -23,6 +23,19 @@ class Settings(BaseSettings):
     db_host: str = Field(alias='POSTGRES_HOST', default='127.0.0.1')
     db_port: int = Field(alias='POSTGRES_PORT', default=5432)
     db_echo_engine: bool = Field(alias='POSTGRES_ECHO_ENGINE', default=False)
+    db_pool_size: int = Field(alias='POSTGRES_POOL_SIZE', default=10)
+    db_max_overflow: int = Field(alias='POSTGRES_MAX_OVERFLOW', default=10)
+    db_pool_timeout: int = Field(
+        alias='POSTGRES_POOL_TIMEOUT', default=30
+    )  # в секундах
+    db_pool_recycle: int = Field(
+        alias='POSTGRES_POOL_RECYCLE', default=30 * 60
+    )  # в секундах
+    # Реплики для чтения через запятую: `host` или `host:port`
+    db_replica_hosts: str = Field(alias='POSTGRES_REPLICA_HOSTS', default='')
+    db_read_your_writes_window: int = Field(
+        alias='POSTGRES_READ_YOUR_WRITES_WINDOW', default=5
+    )  # в секундах, чтения после записи пользователя идут в primary
 
     # Настройки Redis
     redis_host: str = Field(alias='REDIS_HOST', default='127.0.0.1')
@@ -36,14 +49,113 @@ class Settings(BaseSettings):
         alias='SECRET_KEY_REFRESH', default='secret'
     )
     algorithm: str = Field(alias='ALGORITHM', default='HS256')
+    # HS256 подписывает access-токены SECRET_KEY_ACCESS; для RS256/ES256
+    # ключи `<kid>.pem` берутся из ACCESS_TOKEN_KEYS_DIR
+    access_token_algorithm: str = Field(
+        alias='ACCESS_TOKEN_ALGORITHM', default='HS256'
+    )
+    access_token_keys_dir: str = Field(
+        alias='ACCESS_TOKEN_KEYS_DIR', default=os.path.join(BASE_DIR, 'keys')
+    )
+    access_token_active_kid: str | None = Field(
+        alias='ACCESS_TOKEN_ACTIVE_KID', default=None
+    )  # по умолчанию самый новый ключ старше JWKS_MAX_AGE
+    jwks_max_age: int = Field(
+        alias='JWKS_MAX_AGE', default=60 * 60
+    )  # в секундах
     access_token_expire_time: int = Field(
         alias='ACCESS_TOKEN_EXPIRE_TIME', default=15
     )  # в минутах
     refresh_token_expire_time: int = Field(
         alias='REFRESH_TOKEN_EXPIRE_TIME', default=7 * 24 * 60
     )  # в минутах
+    # Подписывать роль и права пользователя в access-токен
+    token_embed_permissions: bool = Field(
+        alias='TOKEN_EMBED_PERMISSIONS', default=False
+    )
+
+    # Кеш проверенных access-токенов в памяти воркера
+    token_cache_size: int = Field(alias='TOKEN_CACHE_SIZE', default=10000)
+    token_cache_ttl: int = Field(
+        alias='TOKEN_CACHE_TTL', default=5
+    )  # в секундах, верхняя граница задержки отзыва токена в других воркерах
+
+    # Пул процессов для bcrypt
+    hashing_workers: int | None = Field(
+        alias='HASHING_WORKERS', default=None
+    )  # по умолчанию по числу ядер
+    hashing_queue_size: int = Field(alias='HASHING_QUEUE_SIZE', default=64)
+    hashing_retry_after: int = Field(
+        alias='HASHING_RETRY_AFTER', default=1
+    )  # в секундах
+
+    # Кеш эффективных прав пользователей
+    permissions_cache_size: int = Field(
+        alias='PERMISSIONS_CACHE_SIZE', default=10000
+    )
+    permissions_local_ttl: int = Field(
+        alias='PERMISSIONS_LOCAL_TTL', default=5
+    )  # в секундах, время жизни записи в памяти воркера
+    permissions_cache_ttl: int = Field(
+        alias='PERMISSIONS_CACHE_TTL', default=60 * 60
+    )  # в секундах, время жизни записи в Redis
+
+    # Bloom-фильтр отозванных access-токенов в памяти воркера
+    revocation_filter_capacity: int = Field(
+        alias='REVOCATION_FILTER_CAPACITY', default=100000
+    )
+    revocation_filter_error_rate: float = Field(
+        alias='REVOCATION_FILTER_ERROR_RATE', default=0.001
+    )
+
+    # Кеш поколений сессий пользователей в памяти воркера
+    session_generation_cache_size: int = Field(
+        alias='SESSION_GENERATION_CACHE_SIZE', default=10000
+    )
+    session_generation_cache_ttl: int = Field(
+        alias='SESSION_GENERATION_CACHE_TTL', default=30
+    )  # в секундах, изменения также приходят через pub/sub
+
+    # Фоновая запись истории входов
+    history_batch_size: int = Field(alias='HISTORY_BATCH_SIZE', default=500)
+    history_flush_interval: float = Field(
+        alias='HISTORY_FLUSH_INTERVAL', default=1
+    )  # в секундах
+    history_max_backlog: int = Field(
+        alias='HISTORY_MAX_BACKLOG', default=50000
+    )
+    # Копировать записи в Redis до вставки, чтобы не терять их при падении
+    history_spill: bool = Field(alias='HISTORY_SPILL', default=False)
+    # Месячные партиции истории входов
+    history_partitions_ahead: int = Field(
+        alias='HISTORY_PARTITIONS_AHEAD', default=3
+    )  # в месяцах, партиции создаются заранее
+    history_retention: int = Field(
+        alias='HISTORY_RETENTION', default=12
+    )  # в месяцах, 0 - хранить всё
+    history_partitions_interval: int = Field(
+        alias='HISTORY_PARTITIONS_INTERVAL', default=6 * 60 * 60
+    )  # в секундах, как часто сервис обслуживает партиции; 0 - не обслуживать
+    # Строк в одной порции выгрузки истории
+    history_export_chunk_size: int = Field(
+        alias='HISTORY_EXPORT_CHUNK_SIZE', default=1000
+    )
+
+    # Массовое назначение роли
+    roles_bulk_max_users: int = Field(
+        alias='ROLES_BULK_MAX_USERS', default=100000
+    )  # пользователей в одном запросе
+    roles_bulk_chunk_size: int = Field(
+        alias='ROLES_BULK_CHUNK_SIZE', default=5000
+    )  # пользователей в одной транзакции
+
+    # Условные ответы для ролей
+    proxy_cache_ttl: int = Field(
+        alias='PROXY_CACHE_TTL', default=5
+    )  # в секундах, сколько nginx отдаёт ответ без перепроверки
 
     # Настройки суперпользователя
+    superuser_role: str = Field(alias='SUPERUSER_ROLE', default='admin')
     admin_email: str = Field(alias='ADMIN_EMAIL', default='admin@example.com')
     admin_password: str = Field(alias='ADMIN_PASSWORD', default='Password123')
 
@@ -13,6 +13,7 @@ from core.config import config
 from models.users import User
 from models.roles import UserRole, Role
 from schemas.users import UserSignUp
+from services.passwords import hash_password
 
 
 def main():
@@ -31,6 +32,7 @@ def main():
                                password=config.admin_password,
                                first_name='admin',
                                last_name='admin',)
+        user_data.password = hash_password(user_data.password)
 
         admin = session.execute(
             select(Role).
@@ -0,0 +1,37 @@
+import secrets
+import time
+import uuid
+
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """UUID версии 7 (RFC 9562): 48 бит времени в мс, затем случайные биты.
+
+    Ключи растут со временем, поэтому вставки идут в правый край B-дерева,
+    а не в случайные страницы индекса. 12 бит после версии — счётчик,
+    который сохраняет порядок ключей одного процесса внутри миллисекунды.
+    Ключи v4, выданные раньше, остаются валидными: тип столбца тот же.
+    """
+    global _last_ms, _counter
+
+    ms = time.time_ns() // 1_000_000
+    if ms > _last_ms:
+        _last_ms = ms
+        # Старший бит счётчика свободен, чтобы в миллисекунде хватило места
+        _counter = secrets.randbits(11)
+    else:
+        _counter += 1
+        if _counter > 0xFFF:
+            _last_ms += 1
+            _counter = secrets.randbits(11)
+
+    value = (
+        (_last_ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | _counter << 64
+        | 0b10 << 62
+        | secrets.randbits(62)
+    )
+    return uuid.UUID(int=value)
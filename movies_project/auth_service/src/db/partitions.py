@@ -0,0 +1,152 @@
+import logging
+import re
+from datetime import date
+
+from sqlalchemy import Connection, text
+
+# Таблица истории входов разбита на месячные партиции
+# `logins_history_YYYYMM`; строки вне созданных диапазонов попадают
+# в `logins_history_default`
+HISTORY_TABLE = 'logins_history'
+DEFAULT_PARTITION = f'{HISTORY_TABLE}_default'
+SCHEMA = 'auth'
+# Одновременно партициями занимается один процесс
+MAINTENANCE_LOCK = 7_340_032
+PARTITION_NAME = re.compile(rf'^{HISTORY_TABLE}_(\d{{4}})(\d{{2}})$')
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return date(year, month_index + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f'{HISTORY_TABLE}_{month:%Y%m}'
+
+
+def month_partition_ddl(month: date) -> str:
+    return (
+        f'CREATE TABLE IF NOT EXISTS {SCHEMA}.{partition_name(month)} '
+        f'PARTITION OF {SCHEMA}.{HISTORY_TABLE} {month_bounds(month)}'
+    )
+
+
+def month_bounds(month: date) -> str:
+    return f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+
+
+def create_month_partition(connection: Connection, month: date) -> bool:
+    """Создаёт партицию месяца; False, если она уже есть.
+
+    Строки месяца, попавшие в default-партицию, пока партиции не было,
+    переносятся в новую таблицу до её подключения: иначе PostgreSQL
+    отказывается создавать партицию, пересекающуюся с ними.
+    """
+    name = partition_name(month)
+    if connection.scalar(text('SELECT to_regclass(:name)'),
+                         {'name': f'{SCHEMA}.{name}'}):
+        return False
+
+    default = f'{SCHEMA}.{DEFAULT_PARTITION}'
+    in_month = f"created_at >= '{month}' AND created_at < '{add_months(month, 1)}'"
+    if not connection.scalar(text(
+            f'SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_month})'
+    )):
+        connection.execute(text(month_partition_ddl(month)))
+        return True
+
+    # Новые строки месяца не должны попасть в default до подключения
+    connection.execute(text(f'LOCK TABLE {default} IN ACCESS EXCLUSIVE MODE'))
+    connection.execute(text(
+        f'CREATE TABLE {SCHEMA}.{name} (LIKE {SCHEMA}.{HISTORY_TABLE} '
+        f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    ))
+    moved = connection.execute(text(
+        f'WITH moved AS (DELETE FROM {default} WHERE {in_month} RETURNING *) '
+        f'INSERT INTO {SCHEMA}.{name} SELECT * FROM moved'
+    )).rowcount
+    connection.execute(text(
+        f'ALTER TABLE {SCHEMA}.{HISTORY_TABLE} '
+        f'ATTACH PARTITION {SCHEMA}.{name} {month_bounds(month)}'
+    ))
+    logging.warning('Moved %d rows from %s to %s', moved, DEFAULT_PARTITION,
+                    name)
+    return True
+
+
+def list_month_partitions(connection: Connection) -> list[date]:
+    names = connection.scalars(text(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'JOIN pg_namespace ns ON ns.oid = parent.relnamespace '
+        'WHERE parent.relname = :table AND ns.nspname = :schema'
+    ), {'table': HISTORY_TABLE, 'schema': SCHEMA})
+
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def drop_month_partition(connection: Connection, month: date) -> None:
+    # DETACH ... CONCURRENTLY недоступен при default-партиции, поэтому
+    # партиция удаляется сразу под короткой блокировкой родителя
+    connection.execute(text(f'DROP TABLE {SCHEMA}.{partition_name(month)}'))
+
+
+def maintain_partitions(connection: Connection, today: date, ahead: int,
+                        retention: int, lock_timeout: str = '5s') -> bool:
+    """Создаёт партиции на ahead месяцев вперёд и удаляет старше retention.
+
+    Каждый месяц обрабатывается в своей транзакции: ошибка на одном
+    записывается в лог и не мешает остальным. False, если обслуживание
+    уже выполняет другой процесс.
+    """
+    if not connection.scalar(text('SELECT pg_try_advisory_lock(:key)'),
+                             {'key': MAINTENANCE_LOCK}):
+        connection.rollback()
+        return False
+    try:
+        # Операции с партициями ждут блокировку родительской таблицы;
+        # не задерживаем за собой запросы сервиса дольше lock_timeout
+        connection.execute(text(f"SET lock_timeout = '{lock_timeout}'"))
+        connection.commit()
+
+        current = month_start(today)
+        for months in range(ahead + 1):
+            month = add_months(current, months)
+            try:
+                if create_month_partition(connection, month):
+                    logging.info('Created partition %s', partition_name(month))
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                logging.exception('Failed to create partition %s',
+                                  partition_name(month))
+
+        if retention > 0:
+            oldest = add_months(current, -retention)
+            for month in list_month_partitions(connection):
+                if month >= oldest:
+                    continue
+                try:
+                    drop_month_partition(connection, month)
+                    connection.commit()
+                    logging.info('Dropped partition %s', partition_name(month))
+                except Exception:
+                    connection.rollback()
+                    logging.exception('Failed to drop partition %s',
+                                      partition_name(month))
+    finally:
+        connection.execute(text('RESET lock_timeout'))
+        connection.execute(text('SELECT pg_advisory_unlock(:key)'),
+                           {'key': MAINTENANCE_LOCK})
+        connection.commit()
+    return True
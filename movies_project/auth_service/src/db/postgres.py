@@ -1,29 +1,73 @@
+import random
+from typing import AsyncIterator
+
 from sqlalchemy import MetaData
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, \
+    async_sessionmaker
+from sqlalchemy.orm import Session, declarative_base
 
 from core.config import config
 
 Base = declarative_base(metadata=MetaData(schema='auth'))
 
-engine = create_async_engine(
-    f'postgresql+asyncpg://'
-    f'{config.db_user}:{config.db_password}@'
-    f'{config.db_host}:{config.db_port}/'
-    f'{config.db_name}',
-    echo=config.db_echo_engine,
-    future=True
-)
+
+def create_engine(host: str, port: int) -> AsyncEngine:
+    return create_async_engine(
+        f'postgresql+asyncpg://'
+        f'{config.db_user}:{config.db_password}@'
+        f'{host}:{port}/'
+        f'{config.db_name}',
+        echo=config.db_echo_engine,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_timeout=config.db_pool_timeout,
+        pool_recycle=config.db_pool_recycle,
+        pool_pre_ping=True,
+        future=True
+    )
+
+
+def create_replica_engines(hosts: str) -> list[AsyncEngine]:
+    engines = []
+    for address in filter(None, map(str.strip, hosts.split(','))):
+        host, _, port = address.partition(':')
+        engines.append(create_engine(host, int(port or config.db_port)))
+    return engines
+
+
+engine = create_engine(config.db_host, config.db_port)
+replica_engines = create_replica_engines(config.db_replica_hosts)
+
+
+class RoutingSession(Session):
+    """Сессия, отправляющая помеченные чтения на реплики.
+
+    На реплику уходят только запросы с `execution_options(replica=True)`
+    и соединения, запрошенные с `bind_arguments={'replica': True}`.
+    После первой записи, а также при `info['primary']`, сессия до конца
+    работает с primary, чтобы видеть собственные изменения.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or (clause is not None and clause.is_dml):
+            self.info['primary'] = True
+
+        replica = kwargs.get('replica') or (
+            clause is not None
+            and clause.get_execution_options().get('replica')
+        )
+        if replica_engines and replica and not self.info.get('primary'):
+            return random.choice(replica_engines).sync_engine
+        return engine.sync_engine
+
 
 async_session = async_sessionmaker(
     engine, class_=AsyncSession,
+    sync_session_class=RoutingSession,
     expire_on_commit=False
 )
 
-db_session: AsyncSession | None
-
 
-# Функция понадобится при внедрении зависимостей
-async def get_async_session() -> AsyncSession:
+async def get_async_session() -> AsyncIterator[AsyncSession]:
     async with async_session() as session:
         yield session
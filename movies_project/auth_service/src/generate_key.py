@@ -0,0 +1,52 @@
+import os
+import secrets
+from datetime import datetime
+
+import typer
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+from core.config import config
+
+
+def main(algorithm: str = config.access_token_algorithm,
+         keys_dir: str = config.access_token_keys_dir):
+    """Создаёт ключ подписи access-токенов и печатает его kid.
+
+    Ротация в два шага, иначе сервисы с закешированным JWKS будут
+    отклонять токены нового ключа:
+
+    1. Сгенерировать ключ и перезапустить сервис: ключ попадёт в JWKS,
+       но подписывать будет прежний активный.
+    2. Не раньше чем через JWKS_MAX_AGE сделать новый ключ активным:
+       задать ACCESS_TOKEN_ACTIVE_KID или, если он не задан, просто
+       перезапустить сервис - активным станет самый новый ключ,
+       опубликованный хотя бы JWKS_MAX_AGE назад.
+
+    Старый ключ удаляется не раньше, чем истекут выпущенные им токены.
+    """
+    if algorithm == 'RS256':
+        private_key = rsa.generate_private_key(public_exponent=65537,
+                                               key_size=2048)
+    elif algorithm == 'ES256':
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        raise typer.BadParameter(f'Unsupported algorithm {algorithm}')
+
+    kid = f'{datetime.utcnow():%Y%m%d}-{secrets.token_hex(4)}'
+    os.makedirs(keys_dir, exist_ok=True)
+    path = os.path.join(keys_dir, f'{kid}.pem')
+    with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600),
+              'wb') as key_file:
+        key_file.write(private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    typer.echo(kid)
+    typer.echo(f'Key is published now; activate it after '
+               f'{config.jwks_max_age} seconds', err=True)
+
+
+if __name__ == '__main__':
+    typer.run(main)
@@ -0,0 +1,214 @@
+import csv
+import io
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from enum import Enum
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterator
+
+import orjson
+import typer
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+
+from core.config import config
+from db.ids import uuid7
+from models.users import User, normalize_email
+from schemas.users import UserImport
+from services.passwords import hash_password
+
+STAGING_TABLE = 'users_import'
+COLUMNS = ('id', 'email', 'password', 'first_name', 'last_name',
+           'disabled', 'created_at')
+BCRYPT_HASH = re.compile(r'^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$')
+# Как в UserLogin; хеш bcrypt проверяется отдельно
+PASSWORD_MAX_LENGTH = 50
+
+
+class InputFormat(str, Enum):
+    csv = 'csv'
+    ndjson = 'ndjson'
+
+
+def read_rows(path: Path, input_format: InputFormat) -> Iterator[dict]:
+    with path.open(encoding='utf-8', newline='') as file:
+        if input_format == InputFormat.csv:
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield orjson.loads(line)
+
+
+def prepare_row(row: dict, pre_hashed: bool) -> dict | None:
+    """Проверяет строку как регистрацию; None - строка отклонена.
+
+    Одна некорректная строка сорвала бы COPY всей порции, и импорт
+    повторял бы её при каждом возобновлении.
+    """
+    try:
+        user = UserImport.model_validate(row)
+    except ValidationError as err:
+        logging.debug('Rejected row: %s', err)
+        return None
+    if pre_hashed:
+        if not BCRYPT_HASH.match(user.password):
+            return None
+    elif len(user.password) > PASSWORD_MAX_LENGTH:
+        return None
+
+    return {
+        'id': uuid7(),
+        'email': normalize_email(user.email),
+        'password': user.password,
+        # Как в User.__init__: отсутствующее имя - пустая строка
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'disabled': user.disabled,
+        'created_at': datetime.utcnow(),
+    }
+
+
+def to_copy_buffer(rows: list[dict]) -> io.StringIO:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # Пустое поле без кавычек COPY в формате CSV читает как NULL
+        writer.writerow(['' if row[column] is None else row[column]
+                         for column in COLUMNS])
+    buffer.seek(0)
+    return buffer
+
+
+def read_checkpoint(path: Path) -> int:
+    return int(path.read_text()) if path.exists() else 0
+
+
+def write_checkpoint(path: Path, processed: int) -> None:
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(str(processed))
+    os.replace(tmp, path)
+
+
+def import_rows(rows: Iterator[dict],
+                load_chunk: Callable[[list[dict]], tuple[int, int]],
+                checkpoint: Path, chunk_size: int) -> int:
+    """Загружает строки порциями, сохраняя прогресс после каждой.
+
+    load_chunk возвращает число вставленных и отклонённых строк порции.
+    Прерванный импорт при следующем запуске пропускает уже загруженные
+    строки; checkpoint удаляется, когда файл загружен целиком.
+    """
+    skip = read_checkpoint(checkpoint)
+    if skip:
+        typer.echo(f'Resuming after row {skip}')
+
+    rows = islice(rows, skip, None)
+    processed, inserted, rejected = skip, 0, 0
+    started = time.monotonic()
+    while chunk := list(islice(rows, chunk_size)):
+        chunk_inserted, chunk_rejected = load_chunk(chunk)
+        inserted += chunk_inserted
+        rejected += chunk_rejected
+
+        processed += len(chunk)
+        write_checkpoint(checkpoint, processed)
+        rate = (processed - skip) / (time.monotonic() - started)
+        typer.echo(f'{processed} rows, {inserted} inserted, '
+                   f'{rejected} rejected, {rate:.0f} rows/s')
+
+    checkpoint.unlink(missing_ok=True)
+    return inserted
+
+
+def main(path: Path = typer.Argument(..., exists=True, dir_okay=False),
+         input_format: InputFormat = typer.Option(None, '--format'),
+         chunk_size: int = 10000,
+         workers: int = typer.Option(None, help='по умолчанию по числу ядер'),
+         pre_hashed: bool = typer.Option(
+             False, help='пароли уже захешированы bcrypt'
+         ),
+         checkpoint: Path = typer.Option(
+             None, help='по умолчанию <path>.checkpoint'
+         ),
+         restart: bool = typer.Option(
+             False, help='начать сначала, не учитывая checkpoint'
+         )):
+    """Загружает пользователей из CSV или NDJSON.
+
+    Порция строк копируется через COPY во временную таблицу и переносится
+    в auth.users одним INSERT ... ON CONFLICT: уже существующие email
+    пропускаются, поэтому повторная загрузка порции ничего не ломает.
+    После каждой порции номер строки сохраняется в checkpoint, и
+    прерванный импорт продолжается с него.
+    """
+    input_format = input_format or InputFormat(
+        'csv' if path.suffix.lower() == '.csv' else 'ndjson'
+    )
+    checkpoint = checkpoint or path.with_name(path.name + '.checkpoint')
+    if restart:
+        checkpoint.unlink(missing_ok=True)
+
+    url = f'postgresql://' \
+          f'{config.db_user}:{config.db_password}@' \
+          f'{config.db_host}:{config.db_port}/' \
+          f'{config.db_name}'
+    engine = create_engine(url, echo=config.db_echo_engine)
+    users = User.__table__.fullname
+    columns = ', '.join(COLUMNS)
+    workers = workers or os.cpu_count() or 1
+
+    connection = engine.raw_connection()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            cursor = connection.cursor()
+            cursor.execute(
+                f'CREATE TEMP TABLE {STAGING_TABLE} '
+                f'(LIKE {users} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+            )
+            connection.commit()
+
+            def load_chunk(chunk: list[dict]) -> tuple[int, int]:
+                prepared = [row for row in (prepare_row(row, pre_hashed)
+                                            for row in chunk) if row]
+                if not pre_hashed:
+                    # bcrypt намеренно медленный: хеши считаются во всех ядрах
+                    passwords = pool.map(
+                        hash_password, [row['password'] for row in prepared],
+                        chunksize=max(1, len(prepared) // (4 * workers))
+                    )
+                    for row, password in zip(prepared, passwords):
+                        row['password'] = password
+
+                cursor.copy_expert(
+                    f'COPY {STAGING_TABLE} ({columns}) FROM STDIN '
+                    f'WITH (FORMAT csv)',
+                    to_copy_buffer(prepared)
+                )
+                # Повторы email внутри файла отбрасываются до вставки:
+                # ON CONFLICT не может дважды обработать одну строку
+                cursor.execute(
+                    f'INSERT INTO {users} ({columns}) '
+                    f'SELECT DISTINCT ON (lower(email)) {columns} '
+                    f'FROM {STAGING_TABLE} ORDER BY lower(email) '
+                    f'ON CONFLICT (lower(email)) DO NOTHING'
+                )
+                inserted = cursor.rowcount
+                connection.commit()
+                return inserted, len(chunk) - len(prepared)
+
+            inserted = import_rows(read_rows(path, input_format), load_chunk,
+                                   checkpoint, chunk_size)
+    finally:
+        connection.close()
+
+    logging.info('Imported %s users from %s', inserted, path)
+
+
+if __name__ == '__main__':
+    typer.run(main)
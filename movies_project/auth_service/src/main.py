@@ -5,24 +5,43 @@ from logging import config as logging_config
 import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
-from fastapi_pagination import add_pagination
 
 from core import logger
 from core.config import config
 from db import redis, postgres
-from api.v1 import auth, users, roles
+from services import generations
+from services.broadcast import broadcaster
+from services.catalog import roles_catalog
+from services.history import history_writer
+from services.partitions import partition_maintainer
+from services.passwords import password_hasher
+from services.revocation import revoked_tokens
+from api import well_known
+from api.v1 import auth, users, roles, metrics
 
 logging_config.dictConfig(logger.LOGGING)
 
 
 async def startup():
-    redis.cache = redis.get_session()
-    postgres.db_session = postgres.get_async_session()
+    redis.cache = await redis.get_session()
+    password_hasher.start()
+    revoked_tokens.setup(redis.cache)
+    generations.setup()
+    roles_catalog.setup(redis.cache)
+    await broadcaster.start(redis.cache)
+    await history_writer.start(redis.cache)
+    partition_maintainer.start()
 
 
 async def shutdown():
+    await partition_maintainer.stop()
+    await history_writer.stop()
+    await broadcaster.stop()
     await redis.cache.close()
-    await postgres.db_session.close()
+    await postgres.engine.dispose()
+    for replica in postgres.replica_engines:
+        await replica.dispose()
+    password_hasher.shutdown()
 
 
 @asynccontextmanager
@@ -44,8 +63,8 @@ app = FastAPI(
 app.include_router(auth.router, prefix='/api/v1/auth', tags=['auth'])
 app.include_router(users.router, prefix='/api/v1/users', tags=['users'])
 app.include_router(roles.router, prefix='/api/v1/roles', tags=['roles'])
-
-add_pagination(app)
+app.include_router(metrics.router, prefix='/api/v1/metrics', tags=['metrics'])
+app.include_router(well_known.router, prefix='/.well-known', tags=['keys'])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,35 @@
+from datetime import date
+
+import typer
+from sqlalchemy import create_engine
+
+from core.config import config
+from db.partitions import list_month_partitions, maintain_partitions, \
+    partition_name
+
+
+def main(ahead: int = config.history_partitions_ahead,
+         retention: int = config.history_retention,
+         lock_timeout: str = '5s'):
+    """Создаёт месячные партиции истории входов наперёд и удаляет старые.
+
+    Запускается при старте контейнера; пока сервис работает, то же самое
+    раз в HISTORY_PARTITIONS_INTERVAL делает сам сервис.
+    """
+    url = f'postgresql://' \
+          f'{config.db_user}:{config.db_password}@' \
+          f'{config.db_host}:{config.db_port}/' \
+          f'{config.db_name}'
+    engine = create_engine(url, echo=config.db_echo_engine)
+
+    with engine.connect() as connection:
+        if not maintain_partitions(connection, date.today(), ahead,
+                                   retention, lock_timeout):
+            typer.echo('Partitions are maintained by another process')
+            return
+        typer.echo(', '.join(partition_name(month) for month
+                             in list_month_partitions(connection)))
+
+
+if __name__ == '__main__':
+    typer.run(main)
@@ -0,0 +1,48 @@
+"""Case-insensitive email
+
+Revision ID: 3c5e9b1d7a24
+Revises: eaf00a3877b8
+Create Date: 2026-10-18 09:12:40.518223
+
+Уже сохранённые email приводятся к нижнему регистру. Если в базе есть
+адреса, различающиеся только регистром, миграция остановится на UPDATE:
+такие учётные записи нужно сначала объединить вручную.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '3c5e9b1d7a24'
+down_revision = 'eaf00a3877b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        'UPDATE auth.users SET email = lower(trim(email)) '
+        'WHERE email <> lower(trim(email))'
+    )
+
+    # CONCURRENTLY не блокирует запись в таблицу, но не работает внутри
+    # транзакции. После неудачной попытки остаётся невалидный индекс:
+    # его нужно удалить до повторного запуска
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'users_email_lower_idx', 'users', [sa.text('lower(email)')],
+            unique=True, schema='auth',
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+    op.drop_constraint('users_email_key', 'users', schema='auth')
+
+
+def downgrade() -> None:
+    op.create_unique_constraint('users_email_key', 'users', ['email'],
+                                schema='auth')
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'users_email_lower_idx', 'users', schema='auth',
+            postgresql_concurrently=True, if_exists=True
+        )
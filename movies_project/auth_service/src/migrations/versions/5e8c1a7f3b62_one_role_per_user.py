@@ -0,0 +1,48 @@
+"""One role per user
+
+Revision ID: 5e8c1a7f3b62
+Revises: b41f6c2e9d53
+Create Date: 2026-10-18 15:26:04.731950
+
+У пользователя одна роль, и массовое назначение опирается на это
+через ON CONFLICT (user_id). Если из-за гонки у пользователя оказалось
+несколько ролей, остаётся одна из них.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5e8c1a7f3b62'
+down_revision = 'b41f6c2e9d53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        'DELETE FROM auth.users_roles AS extra USING auth.users_roles AS kept '
+        'WHERE extra.user_id = kept.user_id AND extra.ctid < kept.ctid'
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'users_roles_user_id_key', 'users_roles', ['user_id'],
+            unique=True, schema='auth',
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+    # Ограничение забирает готовый индекс и не сканирует таблицу заново;
+    # уникальность пары (user_id, role_id) следует из него
+    op.execute(
+        'ALTER TABLE auth.users_roles ADD CONSTRAINT users_roles_user_id_key '
+        'UNIQUE USING INDEX users_roles_user_id_key'
+    )
+    op.drop_constraint('users_roles_user_id_role_id_key', 'users_roles',
+                       schema='auth')
+
+
+def downgrade() -> None:
+    op.create_unique_constraint('users_roles_user_id_role_id_key',
+                                'users_roles', ['user_id', 'role_id'],
+                                schema='auth')
+    op.drop_constraint('users_roles_user_id_key', 'users_roles',
+                       schema='auth')
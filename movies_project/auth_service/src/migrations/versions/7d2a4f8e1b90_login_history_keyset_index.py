@@ -0,0 +1,34 @@
+"""Login history keyset index
+
+Revision ID: 7d2a4f8e1b90
+Revises: 3c5e9b1d7a24
+Create Date: 2026-10-18 11:03:17.204381
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '7d2a4f8e1b90'
+down_revision = '3c5e9b1d7a24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'logins_history_user_created_idx', 'logins_history',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            schema='auth',
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'logins_history_user_created_idx', 'logins_history',
+            schema='auth',
+            postgresql_concurrently=True, if_exists=True
+        )
@@ -0,0 +1,94 @@
+"""Partition login history by month
+
+Revision ID: b41f6c2e9d53
+Revises: 7d2a4f8e1b90
+Create Date: 2026-10-18 12:26:51.731904
+
+Таблица пересоздаётся секционированной и данные копируются в неё в одной
+транзакции: на время копирования запись истории блокируется. Первичный
+ключ секционированной таблицы обязан включать ключ секционирования,
+поэтому он становится (id, created_at).
+"""
+from datetime import date
+
+from alembic import context, op
+
+from core.config import config
+from db.partitions import add_months, month_partition_ddl, month_start
+
+# revision identifiers, used by Alembic.
+revision = 'b41f6c2e9d53'
+down_revision = '7d2a4f8e1b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE auth.logins_history RENAME TO logins_history_old')
+    op.execute('ALTER TABLE auth.logins_history_old '
+               'RENAME CONSTRAINT logins_history_pkey '
+               'TO logins_history_old_pkey')
+    op.execute('DROP INDEX IF EXISTS auth.logins_history_user_created_idx')
+
+    op.execute('''
+        CREATE TABLE auth.logins_history (
+            id UUID NOT NULL,
+            user_id UUID NOT NULL
+                REFERENCES auth.users (id) ON DELETE CASCADE,
+            source VARCHAR(255),
+            login_time TIMESTAMP WITHOUT TIME ZONE,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    ''')
+    op.execute('CREATE INDEX logins_history_user_created_idx '
+               'ON auth.logins_history (user_id, created_at DESC, id DESC)')
+    op.execute('CREATE TABLE auth.logins_history_default '
+               'PARTITION OF auth.logins_history DEFAULT')
+
+    first = None
+    if not context.is_offline_mode():
+        first = op.get_bind().exec_driver_sql(
+            'SELECT min(coalesce(created_at, login_time)) '
+            'FROM auth.logins_history_old'
+        ).scalar()
+    current = month_start(date.today())
+    month = month_start(first.date()) if first else current
+    while month <= add_months(current, config.history_partitions_ahead):
+        op.execute(month_partition_ddl(month))
+        month = add_months(month, 1)
+
+    op.execute('''
+        INSERT INTO auth.logins_history
+            (id, user_id, source, login_time, created_at)
+        SELECT id, user_id, source, login_time,
+               coalesce(created_at, login_time, now())
+        FROM auth.logins_history_old
+    ''')
+    op.execute('DROP TABLE auth.logins_history_old')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE auth.logins_history RENAME TO logins_history_old')
+    op.execute('ALTER TABLE auth.logins_history_old '
+               'RENAME CONSTRAINT logins_history_pkey '
+               'TO logins_history_old_pkey')
+    op.execute('ALTER INDEX auth.logins_history_user_created_idx '
+               'RENAME TO logins_history_old_user_created_idx')
+
+    op.execute('''
+        CREATE TABLE auth.logins_history (
+            id UUID PRIMARY KEY,
+            user_id UUID NOT NULL
+                REFERENCES auth.users (id) ON DELETE CASCADE,
+            source VARCHAR(255),
+            login_time TIMESTAMP WITHOUT TIME ZONE,
+            created_at TIMESTAMP WITHOUT TIME ZONE
+        )
+    ''')
+    op.execute('INSERT INTO auth.logins_history '
+               'SELECT id, user_id, source, login_time, created_at '
+               'FROM auth.logins_history_old')
+    op.execute('CREATE INDEX logins_history_user_created_idx '
+               'ON auth.logins_history (user_id, created_at DESC, id DESC)')
+    op.execute('DROP TABLE auth.logins_history_old CASCADE')
@@ -5,6 +5,7 @@ Revises:
 Create Date: 2023-10-31 17:21:12.950357
 
 """
+import sqlalchemy as sa
 from alembic import op
 
 from models.history import LoginHistory
@@ -22,7 +23,9 @@ def upgrade() -> None:
     op.create_table(
         'users',
         User.id.expression,
-        User.email.expression,
+        # Уникальность email в модели с тех пор задаётся индексом по
+        # lower(email), а ограничение убирает миграция 3c5e9b1d7a24
+        sa.Column('email', sa.String(50), unique=True, nullable=False),
         User.password.expression,
         User.first_name.expression,
         User.last_name.expression,
@@ -1,29 +1,31 @@
-import uuid
 from datetime import datetime
 
-from passlib.context import CryptContext
 from sqlalchemy import (
     Column, ForeignKey, String,
-    DateTime,
+    DateTime, Index,
 )
 from sqlalchemy.dialects.postgresql import UUID
 
+from db.ids import uuid7
 from db.postgres import Base
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 class LoginHistory(Base):
     __tablename__ = 'logins_history'
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
-                unique=True, nullable=False)
+    # Таблица секционирована по created_at помесячно, см. db/partitions.py;
+    # ключ секционирования обязан входить в первичный ключ
+    __table_args__ = {'postgresql_partition_by': 'RANGE (created_at)'}
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7,
+                nullable=False)
     user_id = Column(UUID,
                      ForeignKey('users.id', ondelete='CASCADE'),
                      nullable=False)
     source = Column(String(255), default=None)
     login_time = Column(DateTime, default=datetime.utcnow)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow,
+                        nullable=False)
 
     def __init__(self,
                  user_id: UUID,
@@ -31,3 +33,12 @@ class LoginHistory(Base):
         self.user_id = user_id
         self.source = source
         self.login_time = self.login_time
+
+
+# Постраничная выдача истории пользователя от новых записей к старым
+logins_history_user_created_idx = Index(
+    'logins_history_user_created_idx',
+    LoginHistory.user_id,
+    LoginHistory.created_at.desc(),
+    LoginHistory.id.desc(),
+)
@@ -1,4 +1,3 @@
-import uuid
 from datetime import datetime
 
 from sqlalchemy import (
@@ -8,13 +7,14 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import UUID
 
+from db.ids import uuid7
 from db.postgres import Base
 
 
 class Role(Base):
     __tablename__ = 'roles'
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7,
                 unique=True, nullable=False)
     title = Column(String(255), unique=True, nullable=False)
     permissions = Column(Integer, nullable=False)
@@ -30,13 +30,18 @@ class Role(Base):
 
 class UserRole(Base):
     __tablename__ = 'users_roles'
+    # У пользователя не больше одной роли
+    __table_args__ = (
+        UniqueConstraint('user_id', name='users_roles_user_id_key'),
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7,
                 unique=True, nullable=False)
     user_id = Column(UUID, ForeignKey('users.id', ondelete='CASCADE'),
                      nullable=False)
     role_id = Column(UUID, ForeignKey('roles.id', ondelete='CASCADE'),
                      nullable=False)
+    # Ограничение первой миграции, его заменил users_roles_user_id_key
     user_role_idx = UniqueConstraint('user_id', 'role_id')
 
     def __init__(self, user_id: UUID, role_id: UUID) -> None:
@@ -1,24 +1,26 @@
-import uuid
 from datetime import datetime
 
-from passlib.context import CryptContext
 from sqlalchemy import (
     Column, String, DateTime,
-    Boolean,
+    Boolean, Index, func,
 )
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import validates
 
+from db.ids import uuid7
 from db.postgres import Base
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
 
 
 class User(Base):
     __tablename__ = 'users'
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7,
                 unique=True, nullable=False)
-    email = Column(String(50), unique=True, nullable=False)
+    email = Column(String(50), nullable=False)
     password = Column(String(255), nullable=False)
     first_name = Column(String(50))
     last_name = Column(String(50))
@@ -32,10 +34,19 @@ class User(Base):
                  last_name: str = None,
                  disabled: bool = False) -> None:
         self.email = email
-        self.password = pwd_context.hash(password)
+        self.password = password
         self.first_name = first_name if first_name else ''
         self.last_name = last_name if last_name else ''
         self.disabled = disabled
 
+    @validates('email')
+    def validate_email(self, key: str, email: str) -> str:
+        return normalize_email(email)
+
     def __repr__(self) -> str:
         return f'<User {self.email}>'
+
+
+# Уникальность email без учёта регистра; по этому же индексу идут поиски
+users_email_lower_idx = Index('users_email_lower_idx', func.lower(User.email),
+                              unique=True)
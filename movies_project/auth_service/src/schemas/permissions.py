@@ -0,0 +1,16 @@
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from core import config
+
+
+class PermissionCheck(BaseModel):
+    user_id: UUID
+    permissions: int = Field(...,
+                             description=config.PERMISSIONS_DESC,
+                             ge=0)
+
+
+class PermissionCheckResult(PermissionCheck):
+    allowed: bool
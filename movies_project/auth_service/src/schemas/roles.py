@@ -18,6 +18,12 @@ class AddRole(BaseModel):
     role_id: UUID
 
 
+class AddRoleBulk(BaseModel):
+    user_ids: list[UUID] = Field(
+        ..., min_length=1, max_length=config.config.roles_bulk_max_users
+    )
+
+
 class RoleInDB(RoleCreate):
     id: UUID
 
@@ -0,0 +1,11 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class SessionInfo(BaseModel):
+    id: str
+    source: str | None
+    created_at: datetime
+    expires_at: datetime
+    current: bool = False
@@ -1,7 +1,8 @@
+from dataclasses import dataclass
 from datetime import datetime
 from uuid import UUID
 
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator
 from core import config
 
 
@@ -50,6 +51,39 @@ class UserInDB(UserEmail, UserData):
     hashed_password: str = Field(..., alias="password")
 
 
+class UserImport(BaseModel):
+    """Строка файла импорта: поля и ограничения те же, что у UserSignUp,
+    но имена необязательны, а пароль может быть хешем bcrypt.
+    """
+    email: EmailStr
+    password: str = Field(..., min_length=8, max_length=255)
+    first_name: str = Field('', max_length=50)
+    last_name: str = Field('', max_length=50)
+    disabled: bool = False
+
+    @field_validator('first_name', 'last_name', 'disabled', mode='before')
+    @classmethod
+    def empty_as_default(cls, value, info):
+        if value is None or value == '':
+            return cls.model_fields[info.field_name].default
+        return value
+
+    @field_validator('email')
+    @classmethod
+    def check_email_length(cls, email: str) -> str:
+        if len(email) > 50:
+            raise ValueError('email is longer than 50 characters')
+        return email
+
+
+@dataclass(frozen=True, slots=True)
+class UserCredentials:
+    """Данные для проверки пароля, без валидации и лишних колонок."""
+    id: UUID
+    hashed_password: str
+    disabled: bool
+
+
 class UserRoleCreate(BaseModel):
     user_id: UUID
     role_id: UUID
@@ -66,3 +100,10 @@ class UserHistory(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class UserHistoryPage(BaseModel):
+    items: list[UserHistory]
+    size: int
+    next_cursor: str | None = None
+    total: int | None = None
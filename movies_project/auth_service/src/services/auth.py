@@ -1,28 +1,55 @@
+import calendar
 import logging
+import secrets
+import time
 from datetime import datetime, timedelta
-from functools import lru_cache
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError, ExpiredSignatureError
-from passlib.context import CryptContext
 from pydantic import BaseModel
 from redis.asyncio import Redis
-from sqlalchemy import select
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models.users import User
-from services.database import CacheDep, DbDep
+from models.users import User, normalize_email
+from schemas.sessions import SessionInfo
+from schemas.users import UserResponseData, UserSignUp
+from services.cache import TTLCache
+from services.database import CacheDep, DbDep, email_scope, \
+    mark_recent_writes
+from services.generations import bump_generation, get_generation
+from services.keys import access_keys
+from services.passwords import password_hasher
+from services.permissions import EffectivePermissions, PermissionService, \
+    PermissionServiceDep
+from services.revocation import revoked_tokens
+from services.sessions import SESSION_REUSED, SESSION_ROTATED, \
+    create_session, keep_only_session, list_sessions, revoke_session, \
+    rotate_session
 from services.users import UserService, UserServiceDep
 from services.exceptions import credentials_exception, \
     relogin_exception, invalid_access_token_exception, user_already_exists_exception, \
-    wrong_username_or_password_exception
+    wrong_username_or_password_exception, stale_permissions_exception, \
+    session_not_found
 from core.config import config
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+verified_tokens = TTLCache(config.token_cache_size, config.token_cache_ttl)
+
+
+def new_refresh() -> tuple[str, datetime]:
+    """jti и срок действия следующего refresh-токена."""
+    expires = datetime.utcnow() + \
+        timedelta(minutes=config.refresh_token_expire_time)
+    return secrets.token_urlsafe(8), expires
+
+
+def to_timestamp(moment: datetime) -> int:
+    return calendar.timegm(moment.utctimetuple())
 
 
 class Token(BaseModel):
@@ -38,132 +65,302 @@ class TokenPayload(BaseModel):
     exp: datetime | int = None
 
 
+class Principal(BaseModel):
+    user_id: UUID
+    exp: int
+    jti: str | None = None
+    session_id: str | None = None
+    generation: int = 0
+    role_id: UUID | None = None
+    permissions: int = 0
+    is_superuser: bool = False
+    role_version: int | None = None
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> 'Principal':
+        return cls(user_id=payload['sub'],
+                   exp=payload['exp'],
+                   jti=payload.get('jti'),
+                   session_id=payload.get('sid'),
+                   generation=payload.get('gen', 0),
+                   role_id=payload.get('role'),
+                   permissions=payload.get('perms', 0),
+                   is_superuser=payload.get('su', False),
+                   role_version=payload.get('rv'))
+
+
 class AuthService:
+    decode_count = 0
+
     def __init__(self, db: AsyncSession, cache: Redis,
-                 user_service: UserService):
+                 user_service: UserService,
+                 permission_service: PermissionService):
         self.db = db
         self.cache = cache
         self.user_service = user_service
+        self.permission_service = permission_service
+
+    async def create_user(self, new_user: UserSignUp) -> UserResponseData:
+        email = normalize_email(new_user.email)
+        # Дешёвая проверка до bcrypt; гонку параллельных регистраций
+        # разрешает ON CONFLICT
+        if await self.user_service.get_user(email=email):
+            raise user_already_exists_exception(email)
+
+        stmt = (
+            insert(User)
+            .values(email=email,
+                    password=await password_hasher.hash(new_user.password),
+                    first_name=new_user.first_name,
+                    last_name=new_user.last_name,
+                    disabled=new_user.disabled)
+            .on_conflict_do_nothing(index_elements=[func.lower(User.email)])
+            .returning(User.id, User.email, User.first_name,
+                       User.last_name, User.disabled)
+        )
+        user = (await self.db.execute(stmt)).one_or_none()
+        await self.db.commit()
+        if user is None:
+            raise user_already_exists_exception(email)
 
-    async def create_user(self, new_user: User) -> None:
-        async with self.db:
-            user_exists = await self.db.execute(
-                select(User).filter(User.email == new_user.email))
-
-            if user_exists.scalars().all():
-                raise user_already_exists_exception(new_user.email)
-
-            self.db.add(new_user)
-            await self.db.commit()
-            await self.db.refresh(new_user)
+        await mark_recent_writes(self.cache, [user.id, email_scope(email)])
+        return UserResponseData(**user._mapping)
 
-    async def login(self, username: str, password: str) -> Token:
+    async def login(self, username: str, password: str,
+                    source: str | None = None) -> Token:
         user = await self.user_service.authenticate_user(username,
                                                          password)
         if not user:
             raise wrong_username_or_password_exception
 
-        await self.user_service.add_history(user_id=user.id)
+        await self.user_service.add_history(user_id=user.id, source=source)
+
+        token = await self.create_token({"sub": str(user.id)}, source)
+        return token
 
-        token = await self.create_token({"sub": str(user.id)})
+    async def create_token(self, data: dict,
+                           source: str | None = None) -> Token:
+        token, refresh_payload = await self.encode_tokens(data)
+        await create_session(self.cache, data['sub'],
+                             session_id=refresh_payload['sid'],
+                             jti=refresh_payload['jti'],
+                             expires_at=refresh_payload['exp'],
+                             source=source)
         return token
 
-    async def create_token(self, data: dict) -> Token:
+    async def encode_tokens(
+            self, data: dict, session_id: str | None = None,
+            refresh: tuple[str, datetime] | None = None
+    ) -> tuple[Token, dict]:
+        """Подписывает пару токенов; refresh - заранее выбранные jti и срок."""
         access_token_interval = \
             timedelta(minutes=config.access_token_expire_time)
-        refresh_token_interval = \
-            timedelta(minutes=config.refresh_token_expire_time)
 
         access_token_expires = datetime.utcnow() + access_token_interval
-        refresh_token_expires = datetime.utcnow() + refresh_token_interval
+        refresh_jti, refresh_token_expires = refresh or new_refresh()
 
+        data = {**data,
+                'gen': await get_generation(self.cache, data['sub']),
+                'sid': session_id or secrets.token_urlsafe(8)}
         to_encode = data.copy()
 
-        to_encode.update({'exp': access_token_expires})
-        access_token = jwt.encode(to_encode,
-                                  config.secret_key_access,
-                                  algorithm=config.algorithm)
+        to_encode.update({'exp': access_token_expires,
+                          'jti': secrets.token_urlsafe(8)})
+        to_encode.update(await self.get_access_claims(data['sub']))
+        access_token = access_keys.sign(to_encode)
 
-        to_encode.update({'exp': refresh_token_expires})
+        to_encode = data.copy()
+        to_encode.update({
+            'exp': to_timestamp(refresh_token_expires),
+            'jti': refresh_jti,
+        })
         refresh_token = jwt.encode(to_encode,
                                    config.secret_key_refresh,
                                    algorithm=config.algorithm)
 
-        await self.cache.set(refresh_token,
-                             to_encode['sub'],
-                             int(config.refresh_token_expire_time * 60))
-
         return Token(
             access_token=access_token,
             refresh_token=refresh_token,
             access_token_expires=access_token_expires,
             refresh_token_expires=refresh_token_expires
-        )
+        ), to_encode
 
-    @staticmethod
-    async def decode_token(token: str, secret_key: str) -> tuple[str, int]:
-        try:
-            payload = jwt.decode(token, secret_key, algorithms=[config.algorithm])
-            token_expire = payload.get('exp')
-            sub = payload.get('sub')
-            cache_expire = \
-                token_expire - int(datetime.timestamp(datetime.now()))
-            if sub is None:
-                raise credentials_exception
-            return sub, cache_expire
-        except JWTError:
-            raise credentials_exception
+    async def get_access_claims(self, user_id: str) -> dict:
+        if not config.token_embed_permissions:
+            return {}
+
+        effective = await self.permission_service.get_permissions(
+            UUID(user_id)
+        )
+        return {
+            'role': str(effective.role_id) if effective.role_id else None,
+            'perms': effective.permissions,
+            'su': effective.is_superuser,
+            'rv': effective.version,
+        }
+
+    async def check_role_version(self, principal: Principal) -> None:
+        if principal.role_version is None:
+            return
+
+        effective = await self.permission_service.get_permissions(
+            principal.user_id
+        )
+        if effective.version > principal.role_version:
+            raise stale_permissions_exception
 
     async def check_access_token(
             self, token: Annotated[str, Depends(oauth2_scheme)]
-    ) -> Token:
-        invalid_token = \
-            await self.cache.get(f'invalid-access-token:{token}')
-        if invalid_token or token == 'undefined':
+    ) -> Principal:
+        if token == 'undefined':
             raise credentials_exception
 
-        try:
-            payload = jwt.decode(token, config.secret_key_access,
-                                 algorithms=[config.algorithm])
+        principal = verified_tokens.get(token)
+        if not principal:
+            AuthService.decode_count += 1
+            try:
+                payload = access_keys.verify(token)
+                principal = Principal.from_payload(payload)
+            except ExpiredSignatureError:
+                raise invalid_access_token_exception
+            except (JWTError, KeyError, ValueError):
+                raise credentials_exception
+
             logging.info('Access token is valid')
-            return Token(**{"access_token": token,
-                            "access_token_expires": payload.get("exp")})
-        except ExpiredSignatureError:
-            raise invalid_access_token_exception
+            verified_tokens.set(token, principal,
+                                ttl=principal.exp - time.time())
+
+        if principal.jti and await revoked_tokens.is_revoked(principal.jti):
+            raise credentials_exception
+        if principal.generation < \
+                await get_generation(self.cache, principal.user_id):
+            raise credentials_exception
+        await self.check_role_version(principal)
+        return principal
+
+    async def verify_request(
+            self, authorization: str | None
+    ) -> EffectivePermissions | None:
+        """Проверка для nginx auth_request: ошибки сводятся к None."""
+        scheme, _, token = (authorization or '').partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            return None
+        try:
+            principal = await self.check_access_token(token)
+        except HTTPException:
+            return None
+
+        if principal.role_version is not None:
+            # Права из токена уже сверены с текущей версией
+            return EffectivePermissions(user_id=principal.user_id,
+                                        role_id=principal.role_id,
+                                        permissions=principal.permissions,
+                                        is_superuser=principal.is_superuser,
+                                        version=principal.role_version)
+        return await self.permission_service.get_permissions(
+            principal.user_id
+        )
 
     async def refresh_access_token(self, refresh_token: str) -> Token:
         try:
-            jwt.decode(refresh_token, config.secret_key_refresh,
-                       algorithms=[config.algorithm])
+            payload = jwt.decode(refresh_token, config.secret_key_refresh,
+                                 algorithms=[config.algorithm])
         except JWTError:
             raise relogin_exception
 
-        user_id = await self.cache.get(refresh_token)
-        if not user_id:
+        user_id, session_id = payload.get('sub'), payload.get('sid')
+        if not user_id or not session_id or not payload.get('jti'):
+            raise relogin_exception
+
+        if payload.get('gen', 0) < await get_generation(self.cache, user_id):
+            await revoke_session(self.cache, user_id, session_id)
             raise relogin_exception
 
-        await self.cache.delete(refresh_token)
+        # Подпись и загрузка прав для claims дороже ротации, поэтому
+        # выполняются только после того, как сессия приняла токен
+        refresh_jti, refresh_expires = new_refresh()
+        rotated = await rotate_session(self.cache, user_id, session_id,
+                                       jti=payload['jti'],
+                                       new_jti=refresh_jti,
+                                       expires_at=to_timestamp(refresh_expires))
+        if rotated == SESSION_REUSED:
+            logging.warning('Refresh token reuse detected, '
+                            'session %s revoked', session_id)
+        if rotated != SESSION_ROTATED:
+            raise relogin_exception
 
-        token = await self.create_token({"sub": str(user_id, 'utf-8')})
+        token, _ = await self.encode_tokens({"sub": user_id},
+                                            session_id=session_id,
+                                            refresh=(refresh_jti,
+                                                     refresh_expires))
         return token
 
-    async def add_invalid_access_token_to_cache(self, token: Token) -> None:
-        sub, cache_expire = \
-            await self.decode_token(token.access_token,
-                                    config.secret_key_access)
-        await self.cache.set(f'invalid-access-token:{token.access_token}',
-                             sub, cache_expire)
+    async def logout_other_sessions(self, principal: Principal) -> Token:
+        # Новое поколение отзывает все выданные токены, включая текущие;
+        # текущая сессия получает новую пару и остаётся в списке одна
+        user_id = str(principal.user_id)
+        await bump_generation(self.cache, user_id)
+        token, refresh_payload = await self.encode_tokens(
+            {"sub": user_id}, session_id=principal.session_id
+        )
+        if not await keep_only_session(self.cache, user_id,
+                                       principal.session_id,
+                                       new_jti=refresh_payload['jti'],
+                                       expires_at=refresh_payload['exp']):
+            # Сессия уже истекла или токен выдан без неё
+            await create_session(self.cache, user_id,
+                                 session_id=refresh_payload['sid'],
+                                 jti=refresh_payload['jti'],
+                                 expires_at=refresh_payload['exp'])
+        return token
 
-    async def get_user_id_from_token(self, token: Token) -> UUID:
-        user_id, _ = await self.decode_token(token.access_token,
-                                             config.secret_key_access)
-        return UUID(user_id)
+    async def revoke_access_token(self, token: str,
+                                  principal: Principal) -> None:
+        verified_tokens.pop(token)
+        if principal.jti:
+            await revoked_tokens.revoke(principal.jti,
+                                        principal.exp - int(time.time()))
+        if principal.session_id:
+            await revoke_session(self.cache, principal.user_id,
+                                 principal.session_id)
+
+    async def get_sessions(self, principal: Principal) -> list[SessionInfo]:
+        sessions = await list_sessions(self.cache, principal.user_id)
+        for session in sessions:
+            session.current = session.id == principal.session_id
+        return sessions
+
+    async def delete_session(self, principal: Principal,
+                             session_id: str) -> None:
+        if not await revoke_session(self.cache, principal.user_id,
+                                    session_id):
+            raise session_not_found(session_id)
 
 
-@lru_cache()
 def get_auth_service(db: DbDep, cache: CacheDep,
-                     user_service: UserServiceDep) -> AuthService:
-    return AuthService(db, cache, user_service)
+                     user_service: UserServiceDep,
+                     permission_service: PermissionServiceDep) -> AuthService:
+    return AuthService(db, cache, user_service, permission_service)
 
 
 AuthServiceDep = Annotated[AuthService, Depends(get_auth_service)]
+
+
+def get_forward_auth_service(db: DbDep, cache: CacheDep) -> AuthService:
+    # Проверка стоит перед каждым запросом через nginx, поэтому сервисы
+    # собираются напрямую, без разрешения их зависимостей в FastAPI
+    return AuthService(db, cache, UserService(db, cache),
+                       PermissionService(db, cache))
+
+
+ForwardAuthServiceDep = Annotated[AuthService,
+                                  Depends(get_forward_auth_service)]
+
+
+async def get_current_principal(
+        token: Annotated[str, Depends(oauth2_scheme)],
+        auth_service: AuthServiceDep) -> Principal:
+    return await auth_service.check_access_token(token)
+
+
+PrincipalDep = Annotated[Principal, Depends(get_current_principal)]
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import suppress
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+
+MessageHandler = Callable[[bytes], Awaitable[None]]
+ResyncHandler = Callable[[], Awaitable[None]]
+
+
+class Broadcaster:
+    """Рассылка событий между воркерами через Redis pub/sub.
+
+    После каждого (пере)подключения вызываются resync-обработчики: пока
+    подписки не было, сообщения могли потеряться. Задача слушателя одна на
+    воркер, поэтому ни ошибка Redis, ни ошибка обработчика её не завершают.
+    """
+
+    def __init__(self, reconnect_delay: float = 1) -> None:
+        self.reconnect_delay = reconnect_delay
+        self._handlers: dict[str, list[MessageHandler]] = defaultdict(list)
+        self._resync_handlers: list[ResyncHandler] = []
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, channel: str, handler: MessageHandler,
+                  resync: ResyncHandler | None = None) -> None:
+        self._handlers[channel].append(handler)
+        if resync:
+            self._resync_handlers.append(resync)
+
+    async def publish(self, cache: Redis, channel: str,
+                      message: str) -> None:
+        await cache.publish(channel, message)
+
+    async def start(self, cache: Redis) -> None:
+        if self._handlers and self._task is None:
+            self._task = asyncio.create_task(self._listen(cache))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _listen(self, cache: Redis) -> None:
+        while True:
+            pubsub = cache.pubsub()
+            try:
+                await pubsub.subscribe(*self._handlers)
+                for resync in self._resync_handlers:
+                    await resync()
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    channel = message['channel'].decode()
+                    for handler in self._handlers[channel]:
+                        try:
+                            await handler(message['data'])
+                        except Exception:
+                            logging.exception('Failed to handle %s message',
+                                              channel)
+            except Exception:
+                # Разрыв, таймаут или сбой resync: после переподключения
+                # resync повторится и восстановит пропущенное
+                logging.exception('Pub/sub listener failed, reconnecting')
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                await pubsub.close()
+
+
+broadcaster = Broadcaster()
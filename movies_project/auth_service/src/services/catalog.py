@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Collection, Mapping
+from uuid import UUID
+
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.roles import Role
+from services.broadcast import broadcaster
+
+ROLES_CHANNEL = 'roles-catalog'
+ROLES_VERSION_KEY = 'roles-catalog-version'
+
+
+@dataclass(frozen=True, slots=True)
+class RoleRecord:
+    id: UUID
+    title: str
+    permissions: int
+    created_at: datetime | None
+
+
+@dataclass(frozen=True, slots=True)
+class RolesSnapshot:
+    version: int
+    roles: tuple[RoleRecord, ...]
+    by_id: Mapping[UUID, RoleRecord]
+    by_title: Mapping[str, RoleRecord]
+    # Отпечаток содержимого: одинаков во всех воркерах и меняется вместе
+    # с ролями, в том числе записанными в базу в обход сервиса
+    etag: str
+
+    @classmethod
+    def build(cls, version: int, roles: list[RoleRecord]) -> 'RolesSnapshot':
+        roles = sorted(roles, key=lambda role: (role.title, role.id))
+        digest = hashlib.blake2b(
+            repr([(role.id, role.title, role.permissions, role.created_at)
+                  for role in roles]).encode(),
+            digest_size=8,
+        ).hexdigest()
+        return cls(
+            version=version,
+            etag=f'{version}-{digest}',
+            roles=tuple(roles),
+            by_id=MappingProxyType({role.id: role for role in roles}),
+            by_title=MappingProxyType({role.title: role for role in roles}),
+        )
+
+
+class RolesCatalog:
+    """Неизменяемый снимок таблицы ролей в памяти воркера.
+
+    Изменение ролей увеличивает версию каталога в Redis и рассылает её
+    остальным воркерам: они сбрасывают снимок и при следующем чтении
+    загружают новый. Без изменений чтения не обращаются ни к Postgres,
+    ни к Redis.
+    """
+
+    def __init__(self) -> None:
+        self.cache: Redis | None = None
+        self.snapshot: RolesSnapshot | None = None
+        # Наибольшая версия из полученных сообщений: снимок, загруженный
+        # одновременно с изменением, не должен пережить сообщение о нём
+        self.latest_version = 0
+        self.loads = 0
+        self._lock = asyncio.Lock()
+
+    def setup(self, cache: Redis) -> None:
+        self.cache = cache
+        broadcaster.subscribe(ROLES_CHANNEL, self._on_changed,
+                              resync=self._resync)
+
+    async def get(self, db: AsyncSession, check_version: bool = False,
+                  role_ids: Collection[UUID] = ()) -> RolesSnapshot:
+        """Возвращает снимок каталога.
+
+        С check_version версия сверяется с Redis: так делают пути, которые
+        кешируют производные от ролей данные и не должны опираться на
+        снимок, сообщение о смене которого ещё не дошло. Если в снимке
+        нет какой-то из role_ids, он перезагружается: роль могла быть
+        добавлена в базу в обход сервиса.
+        """
+        if check_version:
+            self._observe(await self._get_version())
+        snapshot = self.snapshot
+        if self._is_fresh(snapshot, role_ids):
+            return snapshot
+
+        async with self._lock:
+            # Пока ждали блокировку, снимок мог загрузить другой запрос
+            if self.snapshot is not snapshot and \
+                    self._is_fresh(self.snapshot, role_ids):
+                return self.snapshot
+            return await self._load(db)
+
+    def _is_fresh(self, snapshot: RolesSnapshot | None,
+                  role_ids: Collection[UUID] = ()) -> bool:
+        return snapshot is not None and \
+            snapshot.version >= self.latest_version and \
+            all(role_id in snapshot.by_id for role_id in role_ids)
+
+    def _observe(self, version: int) -> None:
+        self.latest_version = max(self.latest_version, version)
+
+    async def _load(self, db: AsyncSession) -> RolesSnapshot:
+        # Версия читается до ролей: если каталог изменится между запросами,
+        # снимок получит старую версию и будет перезагружен после сообщения
+        version = await self._get_version()
+        self._observe(version)
+        # Каталог читается из primary: снимок со свежей версией и данными
+        # отстающей реплики остался бы устаревшим до следующего изменения
+        roles = await db.scalars(select(Role))
+        self.snapshot = RolesSnapshot.build(version, [
+            RoleRecord(id=role.id, title=role.title,
+                       permissions=role.permissions,
+                       created_at=role.created_at)
+            for role in roles
+        ])
+        self.loads += 1
+        return self.snapshot
+
+    async def _get_version(self) -> int:
+        return int(await self.cache.get(ROLES_VERSION_KEY) or 0)
+
+    async def invalidate(self) -> None:
+        version = await self.cache.incr(ROLES_VERSION_KEY)
+        self._observe(version)
+        await broadcaster.publish(self.cache, ROLES_CHANNEL, str(version))
+
+    async def _on_changed(self, message: bytes) -> None:
+        self._observe(int(message))
+
+    async def _resync(self) -> None:
+        # Сообщения могли потеряться, пока не было подписки, а после
+        # перезапуска Redis версия могла начаться заново
+        self.snapshot = None
+        self.latest_version = await self._get_version()
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'roles': len(snapshot.roles) if snapshot else None,
+            'loads': self.loads,
+        }
+
+
+roles_catalog = RolesCatalog()
@@ -1,25 +1,59 @@
-from functools import lru_cache
-from typing import Annotated
+from typing import Annotated, Iterable
+from uuid import UUID
 
 from fastapi import Depends
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.config import config
 from db.redis import get_session as get_redis_session
-from db.postgres import get_async_session as get_postgres_session
+from db.postgres import get_async_session as get_postgres_session, replica_engines
 
 
-@lru_cache()
+# Сессия открывается на запрос: FastAPI кеширует зависимость в пределах
+# запроса, поэтому все сервисы одного запроса работают в одной сессии, а
+# соединение возвращается в пул по завершении запроса.
 def get_cache_service(
         redis: Redis = Depends(get_redis_session)) -> Redis:
     return redis
 
 
-@lru_cache()
 def get_db_service(
         db: AsyncSession = Depends(get_postgres_session)) -> AsyncSession:
     return db
 
 
+def recent_write_key(scope: UUID | str) -> str:
+    return f'recent-write:{scope}'
+
+
+def email_scope(email: str) -> str:
+    """Окно записи для поиска по email, который идёт в обход id."""
+    return f'email:{email}'
+
+
+async def mark_recent_write(cache: Redis, scope: UUID | str) -> None:
+    """Открывает окно, в котором чтения `scope` идут в primary."""
+    if replica_engines:
+        await cache.set(recent_write_key(scope), 1,
+                        ex=config.db_read_your_writes_window)
+
+
+async def mark_recent_writes(cache: Redis,
+                             scopes: Iterable[UUID | str]) -> None:
+    if replica_engines:
+        async with cache.pipeline(transaction=False) as pipe:
+            for scope in scopes:
+                pipe.set(recent_write_key(scope), 1,
+                         ex=config.db_read_your_writes_window)
+            await pipe.execute()
+
+
+async def pin_recent_writes(db: AsyncSession, cache: Redis,
+                            scope: UUID | str) -> None:
+    if replica_engines and await cache.exists(recent_write_key(scope)):
+        db.info['primary'] = True
+
+
 DbDep = Annotated[AsyncSession, Depends(get_db_service)]
 CacheDep = Annotated[Redis, Depends(get_cache_service)]
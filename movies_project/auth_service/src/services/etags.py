@@ -0,0 +1,34 @@
+from fastapi import Request, Response
+
+from core.config import config
+
+
+def make_etag(*parts: object) -> str:
+    return '"' + '.'.join(str(part) for part in parts) + '"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Для If-None-Match теги сравниваются слабо: префикс W/ не учитывается
+    return any(tag.strip().removeprefix('W/') == etag
+               for tag in if_none_match.split(','))
+
+
+def set_cache_headers(response: Response, etag: str) -> None:
+    """Клиенты перепроверяют ответ по ETag на каждом запросе, а nginx
+    держит его X-Accel-Expires секунд, ключуя кеш по токену.
+    """
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Authorization'
+    response.headers['X-Accel-Expires'] = str(config.proxy_cache_ttl)
+
+
+def not_modified_response(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_cache_headers(response, etag)
+    return response
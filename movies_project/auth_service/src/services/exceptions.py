@@ -1,5 +1,7 @@
 from fastapi import HTTPException, status
 
+from core.config import config
+
 
 wrong_username_or_password_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -26,12 +28,30 @@ invalid_access_token_exception = HTTPException(
             headers={"WWW-Authenticate": "Bearer"},
 )
 
+stale_permissions_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="User permissions have changed. "
+           "Create new token with /refresh",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+invalid_cursor_exception = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Invalid pagination cursor",
+)
+
 permission_denied = HTTPException(
     status_code=status.HTTP_403_FORBIDDEN,
     detail="You do not have permission to perform this action.",
     headers={"WWW-Authenticate": "Bearer"},
 )
 
+hashing_overloaded_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many password operations in progress. Please retry later.",
+    headers={"Retry-After": str(config.hashing_retry_after)},
+)
+
 
 role_already_exists = HTTPException(
     status_code=status.HTTP_409_CONFLICT,
@@ -48,6 +68,14 @@ def user_already_exists_exception(email: str) -> HTTPException:
     )
 
 
+def session_not_found(session_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Session with id {session_id} not found",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
 def role_not_found(role_id: str) -> HTTPException:
     return HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,63 @@
+import csv
+import io
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Sequence
+
+import orjson
+from sqlalchemy import Row
+
+ExportChunks = AsyncIterator[Sequence[Row]]
+
+EXPORT_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def to_naive_utc(value: datetime | None) -> datetime | None:
+    """Время в базе хранится без пояса, в UTC.
+
+    asyncpg не принимает время с поясом для такого столбца, а выгрузка
+    узнала бы об ошибке уже после отправки заголовков ответа.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def to_ndjson(chunks: ExportChunks) -> AsyncIterator[bytes]:
+    async for rows in chunks:
+        yield b''.join(
+            orjson.dumps(row._asdict(), option=orjson.OPT_APPEND_NEWLINE)
+            for row in rows
+        )
+
+
+async def ndjson_lines(items: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    async for item in items:
+        yield orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE)
+
+
+async def to_csv(chunks: ExportChunks,
+                 fields: Sequence[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def gzip_stream(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # wbits=31 даёт формат gzip, а не голый deflate
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in body:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,67 @@
+import time
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from core.config import config
+from services.broadcast import broadcaster
+from services.cache import TTLCache
+
+GENERATION_CHANNEL = 'session-generation'
+
+# Поколение - момент смены в мс, а не счётчик: после истечения ключа
+# следующая смена всё равно получит значение больше всех выданных
+# ранее. Часы разных хостов могут расходиться, поэтому значение
+# не меньше предыдущего + 1.
+BUMP_GENERATION = """
+local current = tonumber(redis.call('GET', KEYS[1]) or 0)
+local generation = math.max(tonumber(ARGV[1]), current + 1)
+redis.call('SET', KEYS[1], generation, 'EX', ARGV[2])
+return generation
+"""
+
+# Поколение сессий пользователя: токены с меньшим поколением недействительны
+session_generations = TTLCache(config.session_generation_cache_size,
+                               config.session_generation_cache_ttl)
+
+
+def generation_key(user_id: UUID | str) -> str:
+    return f'session-generation:{user_id}'
+
+
+async def get_generation(cache: Redis, user_id: UUID | str) -> int:
+    user_id = str(user_id)
+    generation = session_generations.get(user_id)
+    if generation is None:
+        generation = int(await cache.get(generation_key(user_id)) or 0)
+        session_generations.set(user_id, generation)
+    return generation
+
+
+async def bump_generation(cache: Redis, user_id: UUID | str) -> int:
+    user_id = str(user_id)
+    script = cache.register_script(BUMP_GENERATION)
+    # Дольше refresh-токена поколение хранить незачем: все токены,
+    # выданные до смены, к моменту истечения ключа уже недействительны
+    generation = await script(keys=[generation_key(user_id)],
+                              args=[int(time.time() * 1000),
+                                    config.refresh_token_expire_time * 60])
+
+    session_generations.set(user_id, generation)
+    await broadcaster.publish(cache, GENERATION_CHANNEL,
+                              f'{user_id}:{generation}')
+    return generation
+
+
+async def _on_generation_bumped(message: bytes) -> None:
+    user_id, generation = message.decode().split(':')
+    session_generations.set(user_id, int(generation))
+
+
+async def _resync() -> None:
+    session_generations.clear()
+
+
+def setup() -> None:
+    broadcaster.subscribe(GENERATION_CHANNEL, _on_generation_bumped,
+                          resync=_resync)
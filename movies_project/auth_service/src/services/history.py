@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+from collections import Counter
+from contextlib import suppress
+from datetime import datetime
+from uuid import UUID
+
+from redis.asyncio import Redis
+from redis.exceptions import LockError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from core.config import config
+from db import postgres
+from db.ids import uuid7
+from models.history import LoginHistory
+from services.database import mark_recent_write
+
+HISTORY_SPILL_KEY = 'login-history-spill'
+HISTORY_SPILL_LOCK = 'login-history-spill-lock'
+SPILL_LOCK_TIMEOUT = 60  # в секундах
+
+
+class HistoryWriter:
+    """Пишет историю входов пачками в фоне, не задерживая выдачу токена.
+
+    Пачка уходит одним многострочным INSERT, когда набирается batch_size
+    записей или проходит flush_interval. С spill каждая запись до вставки
+    копируется в Redis и при старте дописывается в базу, если воркер упал,
+    не успев её сохранить. Повторная вставка безопасна: id записи
+    генерируется здесь, а конфликты по нему игнорируются.
+
+    Пачку, которую база отвергает из-за самих данных (например, пользователь
+    уже удалён), writer делит пополам, пока не найдёт плохие записи, и
+    отбрасывает только их: иначе она навсегда осталась бы в начале очереди.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float,
+                 max_backlog: int, spill: bool) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self.spill = spill
+        self.cache: Redis | None = None
+        self.pending: list[dict] = []
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self._pending_users: Counter = Counter()
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self, cache: Redis) -> None:
+        self.cache = cache
+        if self.spill:
+            await self.drain_spill()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            # Пачка, которую пишет задача, должна завершиться до финальной
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        while self.pending:
+            if not await self.flush():
+                logging.error('Lost %d login history records on shutdown',
+                              len(self.pending))
+                break
+
+    async def add(self, user_id: UUID, source: str | None = None) -> None:
+        now = datetime.utcnow()
+        record = {
+            'id': uuid7(),
+            'user_id': user_id,
+            'source': source,
+            'login_time': now,
+            'created_at': now,
+        }
+        if self.spill:
+            await self.cache.hset(HISTORY_SPILL_KEY, str(record['id']),
+                                  dump_record(record))
+        if len(self.pending) >= self.max_backlog:
+            # База не успевает; с spill запись останется в Redis
+            self.dropped += 1
+            return
+        self._enqueue([record])
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def has_pending(self, user_id: UUID) -> bool:
+        return self._pending_users[user_id] > 0
+
+    def _enqueue(self, records: list[dict]) -> None:
+        self.pending.extend(records)
+        self._pending_users.update(record['user_id'] for record in records)
+
+    async def flush(self) -> bool:
+        async with self._lock:
+            while self.pending:
+                batch = self.pending[:self.batch_size]
+                try:
+                    await self._write_or_split(batch)
+                except Exception:
+                    # Соединение или база недоступны: пачка повторится целиком
+                    self.failed += 1
+                    logging.exception('Failed to write login history')
+                    return False
+                del self.pending[:len(batch)]
+                self._pending_users -= Counter(record['user_id']
+                                               for record in batch)
+        return True
+
+    async def _write_or_split(self, batch: list[dict]) -> None:
+        try:
+            await self._write(batch)
+        except (IntegrityError, DataError) as err:
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                await self._write_or_split(batch[:middle])
+                await self._write_or_split(batch[middle:])
+                return
+            self.rejected += 1
+            logging.error('Dropped login history record %s: %s',
+                          batch[0]['id'], err.orig)
+            await self._unspill(batch)
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    async def _write(self, batch: list[dict]) -> None:
+        async with postgres.async_session() as session:
+            await session.execute(
+                insert(LoginHistory)
+                .values(batch)
+                .on_conflict_do_nothing(
+                    index_elements=[LoginHistory.id, LoginHistory.created_at]
+                )
+            )
+            await session.commit()
+        for user_id in {record['user_id'] for record in batch}:
+            await mark_recent_write(self.cache, user_id)
+        await self._unspill(batch)
+
+    async def _unspill(self, batch: list[dict]) -> None:
+        if self.spill:
+            await self.cache.hdel(HISTORY_SPILL_KEY,
+                                  *(str(record['id']) for record in batch))
+
+    async def drain_spill(self) -> None:
+        # Хеш общий для всех воркеров, а стартуют они одновременно:
+        # разбирает его тот, кто первым взял блокировку
+        lock = self.cache.lock(HISTORY_SPILL_LOCK, timeout=SPILL_LOCK_TIMEOUT)
+        if not await lock.acquire(blocking=False):
+            return
+        try:
+            records = await self.cache.hvals(HISTORY_SPILL_KEY)
+            if records:
+                logging.info('Restoring %d spilled login history records',
+                             len(records))
+                self._enqueue([load_record(record) for record in records])
+                await self.flush()
+        finally:
+            # Блокировка могла истечь, пока база была недоступна
+            with suppress(LockError):
+                await lock.release()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(),
+                                       self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            'pending': len(self.pending),
+            'max_backlog': self.max_backlog,
+            'written': self.written,
+            'batches': self.batches,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'rejected': self.rejected,
+            'spill': self.spill,
+        }
+
+
+def dump_record(record: dict) -> str:
+    return json.dumps(record, default=str)
+
+
+def load_record(raw: bytes) -> dict:
+    record = json.loads(raw)
+    return {
+        'id': UUID(record['id']),
+        'user_id': UUID(record['user_id']),
+        'source': record['source'],
+        'login_time': datetime.fromisoformat(record['login_time']),
+        'created_at': datetime.fromisoformat(record['created_at']),
+    }
+
+
+history_writer = HistoryWriter(
+    batch_size=config.history_batch_size,
+    flush_interval=config.history_flush_interval,
+    max_backlog=config.history_max_backlog,
+    spill=config.history_spill,
+)
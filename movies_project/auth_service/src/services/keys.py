@@ -0,0 +1,95 @@
+import logging
+import os
+import time
+
+from jose import jwk, jwt
+from jose.backends.base import Key
+
+from core.config import config
+
+SYMMETRIC_ALGORITHMS = ('HS256', 'HS384', 'HS512')
+
+
+class KeyRing:
+    """Ключи подписи access-токенов.
+
+    Для асимметричных алгоритмов каждый файл `<kid>.pem` в каталоге ключей
+    публикуется в JWKS и принимается при проверке, а подписывает только
+    активный ключ. Потребители кешируют JWKS на publish_delay секунд,
+    поэтому без явного active_kid активным становится самый новый ключ
+    из опубликованных хотя бы столько времени назад. Ротация описана
+    в generate_key.py.
+    """
+
+    def __init__(self, algorithm: str, secret: str, keys_dir: str,
+                 active_kid: str | None = None,
+                 publish_delay: int = 0) -> None:
+        self.algorithm = algorithm
+        self.publish_delay = publish_delay
+        self.active_kid: str | None = None
+        self._signing_key: Key | None = None
+        self._verifying_keys: dict[str | None, Key] = {}
+        self.jwks: dict = {'keys': []}
+
+        if algorithm in SYMMETRIC_ALGORITHMS:
+            key = jwk.construct(secret, algorithm)
+            self._signing_key = key
+            self._verifying_keys[None] = key
+        else:
+            self._load(keys_dir, active_kid)
+
+    def _load(self, keys_dir: str, active_kid: str | None) -> None:
+        paths = sorted(
+            (os.path.join(keys_dir, name) for name in os.listdir(keys_dir)
+             if name.endswith('.pem')),
+            key=os.path.getmtime,
+        )
+        if not paths:
+            raise RuntimeError(f'No signing keys found in {keys_dir}')
+
+        if active_kid is None:
+            published = [path for path in paths if
+                         os.path.getmtime(path) <= time.time() - self.publish_delay]
+            # Если опубликованных ещё нет, это первый запуск: подписывает
+            # самый старый ключ
+            active_path = published[-1] if published else paths[0]
+            active_kid = os.path.basename(active_path).removesuffix('.pem')
+
+        for path in paths:
+            kid = os.path.basename(path).removesuffix('.pem')
+            with open(path, 'rb') as key_file:
+                private_key = jwk.construct(key_file.read(), self.algorithm)
+            public_key = private_key.public_key()
+            self._verifying_keys[kid] = public_key
+            self.jwks['keys'].append({
+                **public_key.to_dict(), 'kid': kid, 'use': 'sig'
+            })
+            if kid == active_kid:
+                self.active_kid = kid
+                self._signing_key = private_key
+
+        if self._signing_key is None:
+            raise RuntimeError(f'Active signing key {active_kid} not found')
+        logging.info('Loaded %s signing keys, active kid %s',
+                     len(paths), self.active_kid)
+
+    def sign(self, claims: dict) -> str:
+        headers = {'kid': self.active_kid} if self.active_kid else None
+        return jwt.encode(claims, self._signing_key,
+                          algorithm=self.algorithm, headers=headers)
+
+    def verify(self, token: str) -> dict:
+        kid = jwt.get_unverified_header(token).get('kid')
+        key = self._verifying_keys.get(kid)
+        if key is None:
+            raise jwt.JWTError(f'Unknown key id {kid}')
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+
+access_keys = KeyRing(
+    algorithm=config.access_token_algorithm,
+    secret=config.secret_key_access,
+    keys_dir=config.access_token_keys_dir,
+    active_kid=config.access_token_active_kid,
+    publish_delay=config.jwks_max_age,
+)
@@ -0,0 +1,21 @@
+import base64
+from datetime import datetime
+from uuid import UUID
+
+from services.exceptions import invalid_cursor_exception
+
+
+# Курсор указывает на последнюю выданную запись: (created_at, id) в base64,
+# чтобы клиент не зависел от его устройства
+def encode_cursor(created_at: datetime, _id: UUID) -> str:
+    raw = f'{created_at.isoformat()}|{_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        created_at, _id = \
+            base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), UUID(_id)
+    except ValueError:
+        raise invalid_cursor_exception
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import date
+
+from core.config import config
+from db import postgres
+from db.partitions import maintain_partitions
+
+
+class PartitionMaintainer:
+    """Периодически создаёт партиции истории входов и удаляет старые.
+
+    Без этого сервис, проработавший дольше ahead месяцев без перезапуска,
+    начал бы писать историю в default-партицию. Задача есть в каждом
+    воркере, работу выполняет тот, кто захватил advisory-блокировку.
+    """
+
+    def __init__(self, interval: float, ahead: int, retention: int) -> None:
+        self.interval = interval
+        self.ahead = ahead
+        self.retention = retention
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def run_once(self) -> bool:
+        async with postgres.engine.connect() as connection:
+            return await connection.run_sync(
+                maintain_partitions, date.today(), self.ahead, self.retention
+            )
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logging.exception('Partition maintenance failed')
+
+
+partition_maintainer = PartitionMaintainer(
+    interval=config.history_partitions_interval,
+    ahead=config.history_partitions_ahead,
+    retention=config.history_retention,
+)
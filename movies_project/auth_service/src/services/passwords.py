@@ -0,0 +1,72 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+from passlib.context import CryptContext
+
+from core.config import config
+from services.exceptions import hashing_overloaded_exception
+
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """Выносит bcrypt в пул процессов, чтобы не блокировать event loop."""
+
+    def __init__(self, max_workers: int, max_queue: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.rejected = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(verify_password, password, hashed_password)
+
+    async def _submit(self, func: Callable, *args):
+        if self.pending >= self.max_queue:
+            self.rejected += 1
+            raise hashing_overloaded_exception
+
+        self.start()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.max_workers,
+            'pending': self.pending,
+            'max_queue': self.max_queue,
+            'rejected': self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(
+    max_workers=config.hashing_workers or os.cpu_count() or 1,
+    max_queue=config.hashing_queue_size,
+)
@@ -0,0 +1,207 @@
+import time
+from typing import Annotated, Iterable
+from uuid import UUID
+
+from fastapi import Depends
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import config
+from models.roles import UserRole
+from services.cache import TTLCache
+from services.catalog import roles_catalog
+from services.database import get_cache_service, get_db_service
+
+effective_permissions = TTLCache(config.permissions_cache_size,
+                                 config.permissions_local_ttl)
+
+
+class EffectivePermissions(BaseModel):
+    user_id: UUID
+    role_id: UUID | None = None
+    permissions: int = 0
+    is_superuser: bool = False
+    # Момент последнего изменения прав пользователя, мс
+    version: int = 0
+
+    def allows(self, permissions: int) -> bool:
+        return self.is_superuser or \
+            self.permissions & permissions == permissions
+
+    def to_cache(self) -> dict:
+        # Версию пишет только invalidate_permissions
+        return {
+            'role_id': str(self.role_id) if self.role_id else '',
+            'permissions': self.permissions,
+            'is_superuser': int(self.is_superuser),
+        }
+
+    @classmethod
+    def from_cache(cls, user_id: UUID, data: dict) -> 'EffectivePermissions':
+        return cls(
+            user_id=user_id,
+            role_id=data[b'role_id'].decode() or None,
+            permissions=int(data[b'permissions']),
+            is_superuser=bool(int(data[b'is_superuser'])),
+            version=int(data.get(b'version', 0)),
+        )
+
+
+# Версия - момент изменения в мс, но всегда больше прежней: иначе
+# два изменения в одну миллисекунду были бы неразличимы для загрузчика
+INVALIDATE = """
+for _, key in ipairs(KEYS) do
+    local current = tonumber(redis.call('HGET', key, 'version') or 0)
+    redis.call('DEL', key)
+    redis.call('HSET', key, 'version', math.max(tonumber(ARGV[1]), current + 1))
+    redis.call('EXPIRE', key, ARGV[2])
+end
+return 1
+"""
+
+# Загруженные из базы права записываются, только если версия в Redis
+# не изменилась с момента чтения: иначе права успели поменять, и запись
+# вернула бы в кеш устаревшее значение. ARGV: TTL, затем по каждому
+# ключу ожидаемая версия, role_id, permissions, is_superuser.
+STORE_IF_VERSION = """
+local stored = {}
+for i, key in ipairs(KEYS) do
+    local offset = 1 + (i - 1) * 4
+    local version = tonumber(redis.call('HGET', key, 'version') or 0)
+    if version == tonumber(ARGV[offset + 1]) then
+        redis.call('HSET', key, 'role_id', ARGV[offset + 2],
+                   'permissions', ARGV[offset + 3],
+                   'is_superuser', ARGV[offset + 4])
+        redis.call('EXPIRE', key, ARGV[1])
+        stored[i] = 1
+    else
+        stored[i] = 0
+    end
+end
+return stored
+"""
+
+
+def permissions_key(user_id: UUID) -> str:
+    return f'user-permissions:{user_id}'
+
+
+async def invalidate_permissions(cache: Redis,
+                                 user_ids: Iterable[UUID]) -> None:
+    # В Redis остаётся только новая версия прав: по ней выданные ранее
+    # токены со встроенными правами распознаются как устаревшие.
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    for user_id in user_ids:
+        effective_permissions.pop(user_id)
+    script = cache.register_script(INVALIDATE)
+    # Скрипт блокирует Redis, поэтому большие списки идут частями
+    for start in range(0, len(user_ids), 1000):
+        await script(
+            keys=[permissions_key(user_id)
+                  for user_id in user_ids[start:start + 1000]],
+            args=[int(time.time() * 1000), config.permissions_cache_ttl]
+        )
+
+
+class PermissionService:
+    def __init__(self, db: AsyncSession, cache: Redis):
+        self.db = db
+        self.cache = cache
+
+    async def get_permissions(self, user_id: UUID) -> EffectivePermissions:
+        return (await self.get_many([user_id]))[user_id]
+
+    async def get_many(
+            self, user_ids: list[UUID]
+    ) -> dict[UUID, EffectivePermissions]:
+        result = {}
+        for user_id in user_ids:
+            permissions = effective_permissions.get(user_id)
+            if permissions:
+                result[user_id] = permissions
+
+        missing = [user_id for user_id in dict.fromkeys(user_ids)
+                   if user_id not in result]
+        if not missing:
+            return result
+
+        async with self.cache.pipeline(transaction=False) as pipe:
+            for user_id in missing:
+                pipe.hgetall(permissions_key(user_id))
+            cached = await pipe.execute()
+
+        not_cached = {}
+        for user_id, data in zip(missing, cached):
+            if b'permissions' in data:
+                result[user_id] = EffectivePermissions.from_cache(user_id, data)
+                effective_permissions.set(user_id, result[user_id])
+            else:
+                not_cached[user_id] = int(data.get(b'version', 0))
+
+        if not_cached:
+            loaded = await self._load(not_cached)
+            await self._store(loaded)
+            result.update(loaded)
+
+        return result
+
+    async def _store(
+            self, loaded: dict[UUID, EffectivePermissions]
+    ) -> None:
+        args = [config.permissions_cache_ttl]
+        for permissions in loaded.values():
+            cached = permissions.to_cache()
+            args += [permissions.version, cached['role_id'],
+                     cached['permissions'], cached['is_superuser']]
+        script = self.cache.register_script(STORE_IF_VERSION)
+        stored = await script(
+            keys=[permissions_key(user_id) for user_id in loaded],
+            args=args,
+        )
+        for permissions, is_stored in zip(loaded.values(), stored):
+            if is_stored:
+                effective_permissions.set(permissions.user_id, permissions)
+
+    async def _load(
+            self, versions: dict[UUID, int]
+    ) -> dict[UUID, EffectivePermissions]:
+        rows = (await self.db.execute(
+            select(UserRole.user_id, UserRole.role_id)
+            .where(UserRole.user_id.in_(versions))
+        )).all()
+        # Права кешируются надолго, поэтому каталог сверяется с Redis
+        catalog = await roles_catalog.get(
+            self.db, check_version=True,
+            role_ids={role_id for _, role_id in rows},
+        )
+        loaded = {
+            user_id: EffectivePermissions(user_id=user_id, version=version)
+            for user_id, version in versions.items()
+        }
+        for user_id, role_id in rows:
+            role = catalog.by_id.get(role_id)
+            if role is None:
+                continue
+            loaded[user_id] = EffectivePermissions(
+                user_id=user_id,
+                role_id=role.id,
+                permissions=role.permissions,
+                is_superuser=role.title == config.superuser_role,
+                version=versions[user_id],
+            )
+        return loaded
+
+
+def get_permission_service(
+    db: AsyncSession = Depends(get_db_service),
+    cache: Redis = Depends(get_cache_service),
+) -> PermissionService:
+    return PermissionService(db, cache)
+
+
+PermissionServiceDep = Annotated[PermissionService,
+                                 Depends(get_permission_service)]
@@ -0,0 +1,107 @@
+import hashlib
+import math
+
+from redis.asyncio import Redis
+
+from core.config import config
+from services.broadcast import broadcaster
+
+REVOKED_CHANNEL = 'revoked-jti'
+
+
+def revoked_key(jti: str) -> str:
+    return f'revoked-jti:{jti}'
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.size = math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray(self.size // 8 + 1)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+
+class RevocationList:
+    """Список отозванных jti: ключи в Redis и Bloom-фильтр в каждом воркере.
+
+    Отсутствие jti в фильтре значит, что токен точно не отозван, и сеть не
+    нужна. При попадании в фильтр ответ уточняется в Redis.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.cache: Redis | None = None
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.count = 0
+        self.lookups = 0
+        self.remote_lookups = 0
+
+    def setup(self, cache: Redis) -> None:
+        self.cache = cache
+        broadcaster.subscribe(REVOKED_CHANNEL, self._on_revoked,
+                              resync=self.load)
+
+    async def load(self) -> None:
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        count = 0
+        async for key in self.cache.scan_iter(match=revoked_key('*'),
+                                              count=1000):
+            bloom.add(key.decode().removeprefix(revoked_key('')))
+            count += 1
+        self.bloom, self.count = bloom, count
+
+    def add(self, jti: str) -> None:
+        if jti in self.bloom:
+            return
+        self.bloom.add(jti)
+        self.count += 1
+
+    async def _on_revoked(self, jti: bytes) -> None:
+        self.add(jti.decode())
+        if self.count > self.capacity:
+            # Истёкшие jti из фильтра не удаляются, поэтому при
+            # переполнении он собирается заново по живым ключам Redis
+            await self.load()
+
+    async def revoke(self, jti: str, ttl: int) -> None:
+        if ttl <= 0:
+            return
+        await self.cache.set(revoked_key(jti), 1, ttl)
+        self.add(jti)
+        await broadcaster.publish(self.cache, REVOKED_CHANNEL, jti)
+
+    async def is_revoked(self, jti: str) -> bool:
+        self.lookups += 1
+        if jti not in self.bloom:
+            return False
+        self.remote_lookups += 1
+        return bool(await self.cache.exists(revoked_key(jti)))
+
+    def stats(self) -> dict:
+        return {
+            'revoked': self.count,
+            'capacity': self.capacity,
+            'lookups': self.lookups,
+            'remote_lookups': self.remote_lookups,
+        }
+
+
+revoked_tokens = RevocationList(config.revocation_filter_capacity,
+                                config.revocation_filter_error_rate)
@@ -1,23 +1,28 @@
 from typing import Annotated
 from uuid import UUID
-from functools import lru_cache
 
 from fastapi import Depends
+from redis.asyncio import Redis
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models.roles import Role
-from services.database import get_db_service
+from models.roles import Role, UserRole
+from services.catalog import RoleRecord, RolesSnapshot, roles_catalog
+from services.database import get_cache_service, get_db_service
 from services.exceptions import role_not_found, role_already_exists
+from services.permissions import invalidate_permissions
 
 
 class RoleService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, cache: Redis):
         self.db = db
+        self.cache = cache
 
-    async def get_roles(self) -> list[Role]:
-        roles = await self.db.scalars(select(Role))
-        return roles.all()
+    async def get_roles(self) -> list[RoleRecord]:
+        return list((await self.get_catalog()).roles)
+
+    async def get_catalog(self) -> RolesSnapshot:
+        return await roles_catalog.get(self.db)
 
     async def create_role(self, title: str, permissions: int) -> Role:
         role = (await self.db.execute(
@@ -30,6 +35,7 @@ class RoleService:
         self.db.add(role)
         await self.db.commit()
         await self.db.refresh(role)
+        await roles_catalog.invalidate()
         return role
 
     async def update_role(self, role_id: UUID, title: str,
@@ -43,6 +49,12 @@ class RoleService:
         role.permissions = permissions
         await self.db.commit()
         await self.db.refresh(role)
+        # Сначала каталог: права пользователей пересчитываются по его
+        # новой версии
+        await roles_catalog.invalidate()
+        await invalidate_permissions(
+            self.cache, await self._get_role_users(role_id)
+        )
         return role
 
     async def delete_role(self, role_id: UUID) -> None:
@@ -51,15 +63,24 @@ class RoleService:
         if not role:
             raise role_not_found(role_id=role_id)
 
+        user_ids = await self._get_role_users(role_id)
         await self.db.delete(role)
         await self.db.commit()
+        await roles_catalog.invalidate()
+        await invalidate_permissions(self.cache, user_ids)
+
+    async def _get_role_users(self, role_id: UUID) -> list[UUID]:
+        user_ids = await self.db.scalars(
+            select(UserRole.user_id).where(UserRole.role_id == role_id)
+        )
+        return user_ids.all()
 
 
-@lru_cache()
 def get_role_service(
     db: AsyncSession = Depends(get_db_service),
+    cache: Redis = Depends(get_cache_service),
 ) -> RoleService:
-    return RoleService(db)
+    return RoleService(db, cache)
 
 
 RoleServiceDep = Annotated[RoleService, Depends(get_role_service)]
@@ -0,0 +1,138 @@
+import json
+import time
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from core.config import config
+from schemas.sessions import SessionInfo
+
+SESSION_TTL = int(config.refresh_token_expire_time * 60)
+SESSION_ROTATED = 1
+SESSION_REUSED = -1
+
+# Сессии пользователя: хеш `id семейства -> метаданные и jti последнего
+# refresh-токена` и sorted set с моментами истечения для массовой очистки.
+# Каждый скрипт сначала удаляет истёкшие сессии.
+PRUNE_EXPIRED = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+if #expired > 0 then
+    redis.call('HDEL', KEYS[1], unpack(expired))
+    redis.call('ZREM', KEYS[2], unpack(expired))
+end
+"""
+
+CREATE_SESSION = PRUNE_EXPIRED + """
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return 1
+"""
+
+# Ротация атомарно сверяет jti и записывает новый. Предъявление уже
+# использованного токена означает утечку и отзывает всё семейство.
+ROTATE_SESSION = PRUNE_EXPIRED + """
+local raw = redis.call('HGET', KEYS[1], ARGV[2])
+if not raw then
+    return 0
+end
+local session = cjson.decode(raw)
+if session['jti'] ~= ARGV[3] then
+    redis.call('HDEL', KEYS[1], ARGV[2])
+    redis.call('ZREM', KEYS[2], ARGV[2])
+    return -1
+end
+session['jti'] = ARGV[4]
+session['expires_at'] = tonumber(ARGV[5])
+redis.call('HSET', KEYS[1], ARGV[2], cjson.encode(session))
+redis.call('ZADD', KEYS[2], ARGV[5], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+return 1
+"""
+
+# Оставляет только указанную сессию и записывает в неё jti нового
+# refresh-токена; сверять старый jti не нужно, вызов уже прошёл проверку
+# access-токеном этой же сессии.
+KEEP_ONLY_SESSION = PRUNE_EXPIRED + """
+local raw = redis.call('HGET', KEYS[1], ARGV[2])
+redis.call('DEL', KEYS[1], KEYS[2])
+if not raw then
+    return 0
+end
+local session = cjson.decode(raw)
+session['jti'] = ARGV[3]
+session['expires_at'] = tonumber(ARGV[4])
+redis.call('HSET', KEYS[1], ARGV[2], cjson.encode(session))
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return 1
+"""
+
+
+def sessions_key(user_id: UUID | str) -> str:
+    return f'refresh-sessions:{user_id}'
+
+
+def expiry_key(user_id: UUID | str) -> str:
+    return f'refresh-sessions-expiry:{user_id}'
+
+
+async def create_session(cache: Redis, user_id: UUID | str, session_id: str,
+                         jti: str, expires_at: int,
+                         source: str | None = None) -> None:
+    session = json.dumps({
+        'jti': jti,
+        'source': source,
+        'created_at': int(time.time()),
+        'expires_at': expires_at,
+    })
+    script = cache.register_script(CREATE_SESSION)
+    await script(keys=[sessions_key(user_id), expiry_key(user_id)],
+                 args=[int(time.time()), session_id, session, expires_at,
+                       SESSION_TTL])
+
+
+async def rotate_session(cache: Redis, user_id: UUID | str, session_id: str,
+                         jti: str, new_jti: str, expires_at: int) -> int:
+    script = cache.register_script(ROTATE_SESSION)
+    return await script(keys=[sessions_key(user_id), expiry_key(user_id)],
+                        args=[int(time.time()), session_id, jti, new_jti,
+                              expires_at, SESSION_TTL])
+
+
+async def keep_only_session(cache: Redis, user_id: UUID | str,
+                            session_id: str | None, new_jti: str,
+                            expires_at: int) -> bool:
+    """Удаляет остальные сессии пользователя; False, если текущей нет."""
+    script = cache.register_script(KEEP_ONLY_SESSION)
+    return bool(await script(
+        keys=[sessions_key(user_id), expiry_key(user_id)],
+        args=[int(time.time()), session_id or '', new_jti, expires_at,
+              SESSION_TTL]
+    ))
+
+
+async def list_sessions(cache: Redis, user_id: UUID | str) -> list[SessionInfo]:
+    session_ids = await cache.zrangebyscore(expiry_key(user_id),
+                                            int(time.time()), '+inf')
+    if not session_ids:
+        return []
+
+    sessions = await cache.hmget(sessions_key(user_id), session_ids)
+    return [
+        SessionInfo(id=session_id, **json.loads(session))
+        for session_id, session in zip(session_ids, sessions)
+        if session
+    ]
+
+
+async def revoke_session(cache: Redis, user_id: UUID | str,
+                         session_id: str) -> bool:
+    async with cache.pipeline(transaction=True) as pipe:
+        pipe.hdel(sessions_key(user_id), session_id)
+        pipe.zrem(expiry_key(user_id), session_id)
+        deleted, _ = await pipe.execute()
+    return bool(deleted)
@@ -1,61 +1,111 @@
-from functools import lru_cache
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, AsyncIterator, Sequence
 from uuid import UUID
 
+from asyncpg import Record
 from fastapi import Depends
-from fastapi.encoders import jsonable_encoder
-from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy import select, update, delete
+from redis.asyncio import Redis
+from sqlalchemy import Row, delete, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models.users import User, pwd_context
+from core.config import config
+from db.ids import uuid7
+from db.postgres import async_session, replica_engines
+from models.users import User, normalize_email
 from models.history import LoginHistory
-from models.roles import Role, UserRole
-from schemas.users import UserInDB, UserForUpdate
+from models.roles import UserRole
+from schemas.users import UserCredentials, UserForUpdate, UserHistory, \
+    UserHistoryPage
+from services.catalog import RoleRecord, roles_catalog
 from services.exceptions import role_not_found
-from services.database import get_db_service
+from services.database import email_scope, get_cache_service, \
+    get_db_service, mark_recent_write, mark_recent_writes, pin_recent_writes
+from services.etags import make_etag
+from services.history import history_writer
+from services.pagination import decode_cursor, encode_cursor
+from services.passwords import password_hasher
+from services.permissions import EffectivePermissions, invalidate_permissions
+
+# Вход идёт мимо ORM: asyncpg подготавливает запрос один раз на соединение
+# и кеширует его, а из строки берутся только нужные для проверки колонки
+USER_BY_EMAIL = (f'SELECT id, password, disabled FROM {User.__table__.fullname} '
+                 f'WHERE lower(email) = $1')
+USER_BY_ID = (f'SELECT id, password, disabled FROM {User.__table__.fullname} '
+              f'WHERE id = $1')
+
+# Назначение роли пачке пользователей одним запросом. Несуществующие
+# пользователи отсекаются по EXISTS, а строки, где роль уже та же,
+# не переписываются и не попадают в RETURNING
+BULK_ADD_ROLE = text(
+    f'INSERT INTO {UserRole.__table__.fullname} AS assigned '
+    f'(id, user_id, role_id) '
+    f'SELECT requested.id, requested.user_id, CAST(:role_id AS uuid) '
+    f'FROM unnest(CAST(:ids AS uuid[]), CAST(:user_ids AS uuid[])) '
+    f'AS requested (id, user_id) '
+    f'WHERE EXISTS (SELECT FROM {User.__table__.fullname} AS users '
+    f'WHERE users.id = requested.user_id) '
+    f'ON CONFLICT (user_id) DO UPDATE SET role_id = excluded.role_id '
+    f'WHERE assigned.role_id <> excluded.role_id '
+    f'RETURNING assigned.user_id'
+)
+
+HISTORY_EXPORT_COLUMNS = (
+    LoginHistory.id,
+    LoginHistory.user_id,
+    LoginHistory.source,
+    LoginHistory.login_time,
+)
 
 
 class UserService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, cache: Redis):
         self.db = db
+        self.cache = cache
 
     async def get_user(self, _id: str = None,
-                       email: str = None) -> UserInDB:
-        async with self.db:
-            if _id:
-                user_exists = await self.db.execute(
-                    select(User).
-                    where(User.id == _id))
-            elif email:
-                user_exists = await self.db.execute(
-                    select(User).
-                    where(User.email == email))
-            else:
-                raise AttributeError("id and email is None")
-            user = user_exists.scalars().all()
-            if user:
-                return UserInDB(**jsonable_encoder(user[0]))
+                       email: str = None) -> UserCredentials | None:
+        if _id:
+            await pin_recent_writes(self.db, self.cache, _id)
+            query, arg = USER_BY_ID, UUID(str(_id))
+        elif email:
+            query, arg = USER_BY_EMAIL, normalize_email(email)
+            await pin_recent_writes(self.db, self.cache, email_scope(arg))
+        else:
+            raise AttributeError("id and email is None")
+
+        row = await self._fetch_user(query, arg, replica=True)
+        if row is None and replica_engines:
+            # Только что созданного пользователя на реплике может ещё не быть
+            row = await self._fetch_user(query, arg)
+        return UserCredentials(*row) if row else None
+
+    async def _fetch_user(self, query: str, arg: UUID | str,
+                          replica: bool = False) -> Record | None:
+        connection = await self.db.connection(
+            bind_arguments={'replica': replica}
+        )
+        raw_connection = await connection.get_raw_connection()
+        return await raw_connection.driver_connection.fetchrow(query, arg)
 
     async def authenticate_user(self, username: str,
-                                password: str) -> UserInDB | None:
+                                password: str) -> UserCredentials | None:
         user = await self.get_user(email=username)
         if not user:
             return None
-        if not pwd_context.verify(password, user.hashed_password):
+        if not await password_hasher.verify(password, user.hashed_password):
             return None
         return user
 
     async def add_history(self, user_id: UUID, source: str = None) -> None:
-        history = LoginHistory(user_id, source)
-        self.db.add(history)
-        await self.db.commit()
-        await self.db.refresh(history)
+        await history_writer.add(user_id, source)
 
     async def update_user_credentials(
             self, user_for_update: UserForUpdate
     ) -> User:
-        user_in_db: UserInDB = await self.authenticate_user(
+        # Пишущие методы читают только из primary
+        self.db.info['primary'] = True
+        user_in_db: UserCredentials = await self.authenticate_user(
             user_for_update.email, user_for_update.password
         )
         if not user_in_db:
@@ -63,62 +113,182 @@ class UserService:
 
         user: User = await self.db.get(User, user_in_db.id)
         user.email = user_for_update.new_email
-        user.password = pwd_context.hash(user_for_update.new_password)
+        user.password = await password_hasher.hash(
+            user_for_update.new_password
+        )
         await self.db.commit()
         await self.db.refresh(user)
+        # Реплика до догоняния отдала бы по прежнему email старый хеш
+        await mark_recent_writes(self.cache, [
+            user.id,
+            email_scope(normalize_email(user_for_update.email)),
+            email_scope(normalize_email(user.email)),
+        ])
         return user
 
-    async def get_paginated_history(self,
-                                    user_id: UUID) -> list[LoginHistory]:
-        return await paginate(
-            self.db,
-            (
-                select(LoginHistory)
+    async def get_paginated_history(
+            self, user_id: UUID, size: int, cursor: str | None = None,
+            with_total: bool = False
+    ) -> UserHistoryPage:
+        # Входы, ещё не записанные этим воркером, должны попасть в выдачу;
+        # очередь пишется, только если в ней есть входы этого пользователя
+        if history_writer.has_pending(user_id):
+            await history_writer.flush()
+        await pin_recent_writes(self.db, self.cache, user_id)
+
+        # Страница читается по индексу (user_id, created_at, id) от курсора,
+        # поэтому её стоимость не зависит от глубины
+        stmt = (
+            select(LoginHistory)
+            .where(LoginHistory.user_id == user_id)
+            .order_by(LoginHistory.created_at.desc(), LoginHistory.id.desc())
+            .limit(size + 1)
+            .execution_options(replica=True)
+        )
+        if cursor:
+            created_at, _id = decode_cursor(cursor)
+            # Отдельное условие на created_at позволяет отсечь партиции
+            # новее курсора, по сравнению кортежей планировщик этого не делает
+            stmt = stmt.where(
+                LoginHistory.created_at <= created_at,
+                tuple_(LoginHistory.created_at, LoginHistory.id)
+                < tuple_(created_at, _id),
+            )
+        history = (await self.db.scalars(stmt)).all()
+
+        page = UserHistoryPage(
+            items=[UserHistory.model_validate(row) for row in history[:size]],
+            size=size,
+        )
+        if len(history) > size:
+            last = history[size - 1]
+            page.next_cursor = encode_cursor(last.created_at, last.id)
+        if with_total:
+            page.total = await self.db.scalar(
+                select(func.count())
+                .select_from(LoginHistory)
                 .where(LoginHistory.user_id == user_id)
-                .order_by(LoginHistory.created_at)
+                .execution_options(replica=True)
             )
+        return page
+
+    async def stream_history(
+            self, user_id: UUID, since: datetime | None = None,
+            until: datetime | None = None
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Отдаёт историю входов порциями через серверный курсор.
+
+        Выгрузка идёт дольше запроса, поэтому читает в собственной сессии.
+        """
+        if history_writer.has_pending(user_id):
+            await history_writer.flush()
+
+        stmt = (
+            select(*HISTORY_EXPORT_COLUMNS)
+            .where(LoginHistory.user_id == user_id)
+            .order_by(LoginHistory.created_at, LoginHistory.id)
+            .execution_options(replica=True,
+                               yield_per=config.history_export_chunk_size)
         )
+        if since:
+            stmt = stmt.where(LoginHistory.created_at >= since)
+        if until:
+            stmt = stmt.where(LoginHistory.created_at < until)
 
-    async def get_role(self, user_id: UUID) -> UserRole | None:
-        stmt = select(UserRole).where(UserRole.user_id == user_id)
-        user_role: UserRole = (await self.db.scalars(stmt)).first()
+        async with async_session() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions():
+                yield rows
 
-        if not user_role:
-            return None
+    async def get_role(self, user_id: UUID) -> RoleRecord | None:
+        await pin_recent_writes(self.db, self.cache, user_id)
+        role_id = await self.db.scalar(
+            select(UserRole.role_id)
+            .where(UserRole.user_id == user_id)
+            .execution_options(replica=True)
+        )
+        if role_id:
+            catalog = await roles_catalog.get(self.db, role_ids=[role_id])
+            return catalog.by_id.get(role_id)
 
-        return await self.db.get(Role, user_role.role_id)
+    async def get_role_etag(self, permissions: EffectivePermissions) -> str:
+        # Назначение роли меняет версию прав пользователя, а изменение
+        # самих ролей - отпечаток каталога; базу для этого читать не нужно
+        catalog = await roles_catalog.get(self.db)
+        return make_etag('user-role', permissions.role_id,
+                         permissions.version, catalog.etag)
 
     async def add_role(self, user_id: UUID, role_id: UUID) -> None:
-        role = await self.db.get(Role, role_id)
+        self.db.info['primary'] = True
+        catalog = await roles_catalog.get(self.db, check_version=True,
+                                          role_ids=[role_id])
 
-        if not role:
+        if role_id not in catalog.by_id:
             raise role_not_found(role_id)
 
-        user_role = await self.get_role(user_id)
-
-        if not user_role:
-            user_role = UserRole(user_id=user_id, role_id=role_id)
-            self.db.add(user_role)
-        else:
-            await self.db.execute(
-                update(UserRole).where(
-                    UserRole.user_id == user_id
-                ).values(role_id=role_id)
-            )
+        stmt = insert(UserRole).values(
+            id=uuid7(), user_id=user_id, role_id=role_id
+        )
+        await self.db.execute(stmt.on_conflict_do_update(
+            index_elements=[UserRole.user_id],
+            set_={'role_id': stmt.excluded.role_id},
+        ))
         await self.db.commit()
+        await invalidate_permissions(self.cache, [user_id])
+        await mark_recent_write(self.cache, user_id)
+
+    async def add_role_bulk(
+            self, role_id: UUID, user_ids: list[UUID]
+    ) -> AsyncIterator[dict]:
+        catalog = await roles_catalog.get(self.db, check_version=True,
+                                          role_ids=[role_id])
+        if role_id not in catalog.by_id:
+            raise role_not_found(role_id)
+        # Повтор пользователя в одной вставке ON CONFLICT DO UPDATE
+        # не допускает
+        return self._add_role_bulk(role_id, list(dict.fromkeys(user_ids)))
+
+    async def _add_role_bulk(
+            self, role_id: UUID, user_ids: list[UUID]
+    ) -> AsyncIterator[dict]:
+        """Назначает роль порциями, каждая в своей транзакции.
+
+        После каждой порции отдаёт прогресс; если клиент отключится,
+        уже применённые порции останутся в силе.
+        """
+        total, changed = len(user_ids), 0
+        size = config.roles_bulk_chunk_size
+        async with async_session() as session:
+            for start in range(0, total, size):
+                chunk = user_ids[start:start + size]
+                result = await session.execute(BULK_ADD_ROLE, {
+                    'role_id': role_id,
+                    'ids': [uuid7() for _ in chunk],
+                    'user_ids': chunk,
+                })
+                assigned = result.scalars().all()
+                await session.commit()
+
+                await invalidate_permissions(self.cache, assigned)
+                await mark_recent_writes(self.cache, assigned)
+                changed += len(assigned)
+                yield {'processed': start + len(chunk), 'total': total,
+                       'changed': changed}
 
     async def remove_role(self, user_id: UUID):
         await self.db.execute(
             delete(UserRole).where(UserRole.user_id == user_id)
         )
         await self.db.commit()
+        await invalidate_permissions(self.cache, [user_id])
+        await mark_recent_write(self.cache, user_id)
 
 
-@lru_cache()
 def get_user_service(
     db: AsyncSession = Depends(get_db_service),
+    cache: Redis = Depends(get_cache_service),
 ) -> UserService:
-    return UserService(db)
+    return UserService(db, cache)
 
 
 UserServiceDep = Annotated[UserService, Depends(get_user_service)]
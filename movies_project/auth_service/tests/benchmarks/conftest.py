@@ -0,0 +1,51 @@
+"""Микробенчмарки без docker; запускаются отдельно от тестов:
+
+    pytest tests/benchmarks
+
+Результаты выводятся в конце прогона, тесты ничего не утверждают о времени.
+"""
+import sys
+import timeit
+from pathlib import Path
+
+import fakeredis
+import pytest
+import pytest_asyncio
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+
+RESULTS = pytest.StashKey[list]()
+
+
+def pytest_configure(config):
+    config.stash[RESULTS] = []
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash.get(RESULTS, [])
+    if results:
+        terminalreporter.section('benchmarks')
+        for line in results:
+            terminalreporter.write_line(line)
+
+
+@pytest.fixture
+def report(request):
+    """Записывает строку результата под именем теста."""
+    results = request.config.stash[RESULTS]
+    return lambda line: results.append(f'{request.node.name}: {line}')
+
+
+@pytest.fixture
+def per_call():
+    """Лучшее из нескольких повторов время одного вызова, в микросекундах."""
+    def measure(func, number=1000, repeat=5):
+        return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+    return measure
+
+
+@pytest_asyncio.fixture
+async def cache():
+    client = fakeredis.FakeAsyncRedis()
+    yield client
+    await client.close()
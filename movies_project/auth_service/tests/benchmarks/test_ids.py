@@ -0,0 +1,13 @@
+import uuid
+
+from db.ids import uuid7
+
+
+def test_uuid7_generation(per_call, report):
+    v7 = per_call(uuid7, number=10000)
+    v4 = per_call(uuid.uuid4, number=10000)
+
+    ids = [uuid7() for _ in range(100000)]
+    assert all(a < b for a, b in zip(ids, ids[1:]))
+
+    report(f'uuid7 {v7:.2f} us, uuid4 {v4:.2f} us per id')
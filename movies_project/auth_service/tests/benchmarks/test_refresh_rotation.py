@@ -0,0 +1,92 @@
+import asyncio
+import time
+import uuid
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+
+from services.auth import AuthService
+from services.sessions import create_session, rotate_session, sessions_key
+
+pytestmark = pytest.mark.asyncio
+
+ROTATIONS = 200
+# Задержка сети до Redis: fakeredis отвечает мгновенно, а разница между
+# путями определяется числом обращений к серверу
+ROUND_TRIP = 0.0005
+
+
+class SlowRedis(fakeredis.FakeAsyncRedis):
+    round_trips = 0
+
+    async def execute_command(self, *args, **options):
+        self.round_trips += 1
+        await asyncio.sleep(ROUND_TRIP)
+        return await super().execute_command(*args, **options)
+
+
+async def rotate_with_separate_commands(cache, user_id, session_id, jti, new_jti, expires_at):
+    """Прежняя ротация: GET, DELETE и SET отдельными обращениями."""
+    if await cache.get(f'refresh:{jti}') is None:
+        return 0
+    await cache.delete(f'refresh:{jti}')
+    await cache.set(f'refresh:{new_jti}', user_id, ex=expires_at - int(time.time()))
+    return 1
+
+
+async def measure(cache, rotate) -> tuple[float, float]:
+    user_id, session_id = str(uuid.uuid4()), 'session'
+    expires_at = int(time.time()) + 600
+    await create_session(cache, user_id, session_id, jti='0', expires_at=expires_at)
+    await cache.set('refresh:0', user_id)
+    cache.round_trips = 0
+
+    started = time.perf_counter()
+    for i in range(ROTATIONS):
+        assert await rotate(cache, user_id, session_id, str(i), str(i + 1), expires_at) == 1
+    elapsed = time.perf_counter() - started
+    await cache.delete(sessions_key(user_id))
+    return elapsed / ROTATIONS * 1e6, cache.round_trips / ROTATIONS
+
+
+async def test_refresh_rotation_latency(report):
+    cache = SlowRedis()
+    try:
+        separate, separate_trips = await measure(cache, rotate_with_separate_commands)
+        script, script_trips = await measure(
+            cache, lambda *args: rotate_session(*args[:3], jti=args[3], new_jti=args[4], expires_at=args[5])
+        )
+    finally:
+        await cache.close()
+
+    report(f'GET/DELETE/SET {separate:.0f} us ({separate_trips:.1f} round trips), '
+           f'Lua {script:.0f} us ({script_trips:.1f} round trips), '
+           f'asyncio.sleep({ROUND_TRIP}) per command')
+
+
+async def test_rejected_refresh_cost(cache, report):
+    service = AuthService(None, cache, None, None)
+    service.get_access_claims = no_claims
+    user_id = str(uuid.uuid4())
+    token, payload = await service.encode_tokens({'sub': user_id})
+    await create_session(cache, user_id, payload['sid'], payload['jti'], payload['exp'])
+    refresh_token = token.refresh_token
+
+    started = time.perf_counter()
+    for _ in range(ROTATIONS):
+        refresh_token = (await service.refresh_access_token(refresh_token)).refresh_token
+    accepted = (time.perf_counter() - started) / ROTATIONS * 1e6
+
+    started = time.perf_counter()
+    for _ in range(ROTATIONS):
+        with pytest.raises(HTTPException):
+            await service.refresh_access_token(token.refresh_token)
+    rejected = (time.perf_counter() - started) / ROTATIONS * 1e6
+
+    report(f'accepted refresh {accepted:.0f} us, rejected reused token {rejected:.0f} us '
+           f'(no signing, claims not loaded)')
+
+
+async def no_claims(user_id):
+    return {}
@@ -0,0 +1,21 @@
+import time
+import uuid
+
+import pytest
+
+import generate_key
+from services.keys import KeyRing
+
+
+@pytest.mark.parametrize('algorithm', ['HS256', 'RS256', 'ES256'])
+def test_sign_verify_throughput(algorithm, tmp_path, per_call, report):
+    if algorithm != 'HS256':
+        generate_key.main(algorithm=algorithm, keys_dir=str(tmp_path))
+    ring = KeyRing(algorithm, secret='benchmark-secret', keys_dir=str(tmp_path))
+    claims = {'sub': str(uuid.uuid4()), 'exp': int(time.time()) + 600, 'jti': uuid.uuid4().hex}
+    token = ring.sign(claims)
+
+    sign = per_call(lambda: ring.sign(claims), number=200)
+    verify = per_call(lambda: ring.verify(token), number=200)
+
+    report(f'sign {sign:.0f} us ({1e6 / sign:.0f}/s), verify {verify:.0f} us ({1e6 / verify:.0f}/s)')
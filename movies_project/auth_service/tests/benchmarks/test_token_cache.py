@@ -0,0 +1,24 @@
+import time
+import uuid
+
+from jose import jwt
+
+from services.auth import Principal
+from services.cache import TTLCache
+from services.keys import KeyRing
+
+SECRET = 'benchmark-secret'
+
+
+def test_cache_hit_vs_decode(per_call, report):
+    keys = KeyRing('HS256', SECRET, keys_dir='')
+    token = keys.sign({'sub': str(uuid.uuid4()), 'exp': int(time.time()) + 600,
+                       'jti': uuid.uuid4().hex, 'perms': 0b11})
+    cache = TTLCache(maxsize=1000, ttl=60)
+    cache.set(token, Principal.from_payload(keys.verify(token)))
+
+    decode = per_call(lambda: Principal.from_payload(jwt.decode(token, SECRET, algorithms=['HS256'])))
+    verify = per_call(lambda: Principal.from_payload(keys.verify(token)))
+    hit = per_call(lambda: cache.get(token))
+
+    report(f'jwt.decode {decode:.1f} us, KeyRing.verify {verify:.1f} us, cache hit {hit:.2f} us')
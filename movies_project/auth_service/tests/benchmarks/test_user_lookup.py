@@ -0,0 +1,45 @@
+import tracemalloc
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+
+from models.users import User
+from schemas.users import UserCredentials, UserInDB
+
+EMAIL = 'user@example.com'
+HASH = '$2b$12$' + 'a' * 53
+
+
+def orm_path() -> UserInDB:
+    """Прежний get_user без обращения к базе: запрос, ключ кеша компиляции,
+    объект модели и его перекладка в UserInDB."""
+    stmt = select(User).where(User.email == EMAIL).execution_options(replica=True)
+    stmt._generate_cache_key()
+    user = User(email=EMAIL, password=HASH, first_name='Ivan', last_name='Petrov')
+    user.id = uuid.uuid4()
+    return UserInDB(**jsonable_encoder(user))
+
+
+def raw_path(row: tuple) -> UserCredentials:
+    return UserCredentials(*row)
+
+
+def peak_allocation(func) -> int:
+    func()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_user_lookup_per_call(per_call, report):
+    row = (uuid.uuid4(), HASH, False)
+
+    orm = per_call(orm_path, number=200)
+    raw = per_call(lambda: raw_path(row))
+
+    report(f'ORM path {orm:.1f} us, {peak_allocation(orm_path)} B peak; '
+           f'UserCredentials(*row) {raw:.2f} us, {peak_allocation(lambda: raw_path(row))} B peak')
@@ -5,6 +5,7 @@ import asyncio
 pytest_plugins = (
     "tests.functional.fixtures.pg_fixtures",
     "tests.functional.fixtures.aiohttp_fixtures",
+    "tests.functional.fixtures.redis_fixtures",
 )
 
 
@@ -50,9 +50,10 @@ async def clear_db_tables(async_session: AsyncSession):
 
 
 @pytest_asyncio.fixture(scope='function', autouse=True)
-async def cleanup_db(async_session: AsyncSession):
+async def cleanup_db(async_session: AsyncSession, invalidate_roles_catalog):
     yield
     await clear_db_tables(async_session)
+    await invalidate_roles_catalog()
 
 
 @pytest_asyncio.fixture(scope='session', autouse=True)
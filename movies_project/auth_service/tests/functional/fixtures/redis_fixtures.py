@@ -0,0 +1,25 @@
+import pytest
+import pytest_asyncio
+from redis.asyncio import Redis
+
+from tests.functional.settings import settings
+
+ROLES_CHANNEL = 'roles-catalog'
+ROLES_VERSION_KEY = 'roles-catalog-version'
+
+
+@pytest_asyncio.fixture(scope='session')
+async def redis_client() -> Redis:
+    client = Redis(host=settings.redis_host, port=int(settings.redis_port))
+    yield client
+    await client.close()
+
+
+@pytest.fixture(scope='session')
+def invalidate_roles_catalog(redis_client: Redis):
+    """Сообщает сервису об изменении ролей, записанных в базу напрямую."""
+    async def inner():
+        version = await redis_client.incr(ROLES_VERSION_KEY)
+        await redis_client.publish(ROLES_CHANNEL, str(version))
+
+    return inner
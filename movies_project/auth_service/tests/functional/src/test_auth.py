@@ -0,0 +1,252 @@
+import asyncio
+import pytest
+from aiohttp import ClientResponse
+from http import HTTPStatus
+
+from tests.functional.settings import settings
+from tests.functional.testdata.users import get_user
+from tests.functional.testdata.roles import get_role, get_user_role
+
+
+pytestmark = pytest.mark.asyncio
+
+
+async def get_token_decodes(make_request) -> int:
+    response: ClientResponse = await make_request('/api/v1/metrics/')
+    body = await response.json()
+    return body['token_decodes']
+
+
+async def test_token_decoded_once_per_request(get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+
+    decodes = await get_token_decodes(make_request)
+    response: ClientResponse = await make_request(f'/api/v1/users/{fake_user.id}/roles/', token=token)
+    assert response.status == HTTPStatus.OK
+    assert await get_token_decodes(make_request) == decodes + 1
+
+    # повторный запрос с тем же токеном обслуживается из кеша воркера
+    response: ClientResponse = await make_request(f'/api/v1/users/{fake_user.id}/roles/', token=token)
+    assert response.status == HTTPStatus.OK
+    assert await get_token_decodes(make_request) == decodes + 1
+
+
+async def test_token_in_query_is_rejected(get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+
+    response: ClientResponse = await make_request(
+        f'/api/v1/users/{fake_user.id}/roles/', params={'token': token}
+    )
+    assert response.status == HTTPStatus.UNAUTHORIZED
+
+
+async def test_logout(get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+
+    response: ClientResponse = await make_request('/api/v1/auth/logout', method='post', token=token)
+    assert response.status == HTTPStatus.OK
+
+    response: ClientResponse = await make_request(f'/api/v1/users/{fake_user.id}/roles/', token=token)
+    assert response.status == HTTPStatus.UNAUTHORIZED
+
+
+async def test_check_permissions(get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    role, fake_role = get_role()
+    role.permissions = fake_role.permissions = 0b101
+    user_role, _ = get_user_role(fake_user.id, fake_role.id)
+    await pg_add_instances([user, role, user_role])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+
+    response: ClientResponse = await make_request('/api/v1/auth/check', params={
+        'user_id': fake_user.id, 'permissions': 0b100
+    })
+    assert response.status == HTTPStatus.UNAUTHORIZED
+
+    for permissions, allowed in [(0b100, True), (0b101, True), (0b010, False)]:
+        response: ClientResponse = await make_request('/api/v1/auth/check', params={
+            'user_id': fake_user.id, 'permissions': permissions
+        }, token=token)
+        body = await response.json()
+        assert response.status == HTTPStatus.OK
+        assert body == {'user_id': fake_user.id, 'permissions': permissions, 'allowed': allowed}
+
+    response: ClientResponse = await make_request('/api/v1/auth/check/batch', method='post', data=[
+        {'user_id': fake_user.id, 'permissions': 0b001},
+        {'user_id': fake_user.id, 'permissions': 0b011},
+    ], token=token)
+    body = await response.json()
+    assert response.status == HTTPStatus.OK
+    assert [check['allowed'] for check in body] == [True, False]
+
+    response: ClientResponse = await make_request('/api/v1/auth/check', params={
+        'user_id': fake_user.id, 'permissions': -1
+    }, token=token)
+    assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    # чужие права может проверить только суперпользователь
+    other_user, fake_other_user = get_user()
+    await pg_add_instances([other_user])
+    response: ClientResponse = await make_request('/api/v1/auth/check', params={
+        'user_id': fake_other_user.id, 'permissions': 0b001
+    }, token=token)
+    assert response.status == HTTPStatus.FORBIDDEN
+
+    response: ClientResponse = await make_request('/api/v1/auth/check/batch', method='post', data=[
+        {'user_id': fake_user.id, 'permissions': 0b001},
+        {'user_id': fake_other_user.id, 'permissions': 0b001},
+    ], token=token)
+    assert response.status == HTTPStatus.FORBIDDEN
+
+
+async def test_check_permissions_after_role_change(get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    role, fake_role = get_role()
+    role.permissions = fake_role.permissions = 0b001
+    await pg_add_instances([user, role])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+    params = {'user_id': fake_user.id, 'permissions': 0b001}
+
+    response: ClientResponse = await make_request('/api/v1/auth/check', params=params, token=token)
+    assert (await response.json())['allowed'] is False
+
+    await make_request(
+        f'/api/v1/users/{fake_user.id}/roles/', method='post', data={'role_id': fake_role.id}, token=token
+    )
+    response: ClientResponse = await make_request('/api/v1/auth/check', params=params, token=token)
+    assert (await response.json())['allowed'] is True
+
+    await make_request(
+        f'/api/v1/roles/{fake_role.id}/', method='put',
+        data={'title': fake_role.title, 'permissions': 0b010}, token=token
+    )
+    response: ClientResponse = await make_request('/api/v1/auth/check', params=params, token=token)
+    assert (await response.json())['allowed'] is False
+
+
+async def test_logout_other_sessions(get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    credentials = {'username': fake_user.email, 'password': fake_user.password}
+    current_token = await get_token(data=credentials)
+    other_token = await get_token(data=credentials)
+
+    response: ClientResponse = await make_request(
+        '/api/v1/auth/logout-others', method='post', token=current_token
+    )
+    body = await response.json()
+    assert response.status == HTTPStatus.OK
+
+    url = f'/api/v1/users/{fake_user.id}/roles/'
+    response: ClientResponse = await make_request(url, token=other_token)
+    assert response.status == HTTPStatus.UNAUTHORIZED
+
+    response: ClientResponse = await make_request(url, token=body['access_token'])
+    assert response.status == HTTPStatus.OK
+
+    # в списке остаётся только текущая сессия, её refresh-токен действителен
+    response: ClientResponse = await make_request('/api/v1/auth/sessions', token=body['access_token'])
+    sessions = await response.json()
+    assert response.status == HTTPStatus.OK
+    assert [session['current'] for session in sessions] == [True]
+
+    response: ClientResponse = await make_request(
+        '/api/v1/auth/refresh', method='post', params={'token': body['refresh_token']}
+    )
+    assert response.status == HTTPStatus.OK
+
+
+async def test_concurrent_refresh_with_same_token(aiohttp_session, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    async with aiohttp_session.post(
+        settings.service_url + '/api/v1/auth/login',
+        data={'username': fake_user.email, 'password': fake_user.password},
+    ) as response:
+        refresh_token = (await response.json())['refresh_token']
+
+    responses = await asyncio.gather(*[
+        make_request('/api/v1/auth/refresh', method='post', params={'token': refresh_token})
+        for _ in range(2)
+    ])
+    assert sorted(response.status for response in responses) == [HTTPStatus.OK, HTTPStatus.UNAUTHORIZED]
+
+    # повторное предъявление токена отзывает всё семейство, включая выданный победителю
+    winner = next(response for response in responses if response.status == HTTPStatus.OK)
+    new_refresh_token = (await winner.json())['refresh_token']
+    response: ClientResponse = await make_request(
+        '/api/v1/auth/refresh', method='post', params={'token': new_refresh_token}
+    )
+    assert response.status == HTTPStatus.UNAUTHORIZED
+
+
+async def test_list_and_revoke_sessions(get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    credentials = {'username': fake_user.email, 'password': fake_user.password}
+    token = await get_token(data=credentials)
+    await get_token(data=credentials)
+
+    response: ClientResponse = await make_request('/api/v1/auth/sessions', token=token)
+    sessions = await response.json()
+    assert response.status == HTTPStatus.OK
+    assert len(sessions) == 2
+    assert sum(session['current'] for session in sessions) == 1
+
+    other_session = next(session for session in sessions if not session['current'])
+    response: ClientResponse = await make_request(
+        f'/api/v1/auth/sessions/{other_session["id"]}', method='delete', token=token
+    )
+    assert response.status == HTTPStatus.NO_CONTENT
+
+    response: ClientResponse = await make_request('/api/v1/auth/sessions', token=token)
+    assert [session['current'] for session in await response.json()] == [True]
+
+
+async def test_concurrent_signup_creates_one_user(make_request):
+    _, fake_user = get_user()
+    data = {
+        'email': fake_user.email,
+        'password': fake_user.password,
+        'first_name': fake_user.first_name,
+        'last_name': fake_user.last_name,
+    }
+
+    responses = await asyncio.gather(*[
+        make_request('/api/v1/auth/signup', method='post', data=data)
+        for _ in range(10)
+    ])
+    statuses = [response.status for response in responses]
+    assert statuses.count(HTTPStatus.CREATED) == 1
+    assert statuses.count(HTTPStatus.UNAUTHORIZED) == 9
+
+
+async def test_verify_for_auth_request(aiohttp_session, get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    role, fake_role = get_role()
+    role.permissions = fake_role.permissions = 0b101
+    user_role, _ = get_user_role(fake_user.id, fake_role.id)
+    await pg_add_instances([user, role, user_role])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+    url = f'{settings.service_url}/api/v1/auth/verify'
+
+    for headers in [{}, {'Authorization': 'Bearer invalid'}, {'Authorization': token}]:
+        async with aiohttp_session.get(url, headers=headers) as response:
+            assert response.status == HTTPStatus.UNAUTHORIZED
+            assert await response.read() == b''
+
+    async with aiohttp_session.get(url, headers={'Authorization': f'Bearer {token}'}) as response:
+        assert response.status == HTTPStatus.NO_CONTENT
+        assert response.headers['X-User-Id'] == fake_user.id
+        assert response.headers['X-User-Permissions'] == str(0b101)
+        assert await response.read() == b''
+
+    await make_request('/api/v1/auth/logout', method='post', token=token)
+    async with aiohttp_session.get(url, headers={'Authorization': f'Bearer {token}'}) as response:
+        assert response.status == HTTPStatus.UNAUTHORIZED
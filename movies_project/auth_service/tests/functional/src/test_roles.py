@@ -1,3 +1,4 @@
+import json
 import pytest
 import uuid
 from aiohttp import ClientResponse
@@ -6,15 +7,16 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from passlib.context import CryptContext
 
+from tests.functional.settings import settings
 from tests.functional.testdata.users import get_user
-from tests.functional.testdata.roles import get_role, Role
+from tests.functional.testdata.roles import get_role, get_user_role, Role, UserRole
 
 
 pytestmark = pytest.mark.asyncio
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
 
-async def test_get_roles(get_token, make_request, pg_add_instances):
+async def test_get_roles(get_token, make_request, pg_add_instances, invalidate_roles_catalog):
     response: ClientResponse = await make_request('/api/v1/roles/')
     assert response.status == HTTPStatus.UNAUTHORIZED
 
@@ -23,6 +25,7 @@ async def test_get_roles(get_token, make_request, pg_add_instances):
     role3, fake_role3 = get_role()
     user, fake_user = get_user()
     await pg_add_instances([user, role1, role2, role3])
+    await invalidate_roles_catalog()
     token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
     response: ClientResponse = await make_request('/api/v1/roles/', token=token)
     body = await response.json()
@@ -91,3 +94,81 @@ async def test_delete_role(async_session: AsyncSession, get_token, make_request,
     roles = (await async_session.execute(select(Role))).all()
     assert response.status == HTTPStatus.NO_CONTENT
     assert len(roles) == 0
+
+
+async def test_roles_catalog_follows_changes(get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+
+    response: ClientResponse = await make_request(
+        '/api/v1/roles/', method='post', data={'title': 'editor', 'permissions': 1}, token=token
+    )
+    role_id = (await response.json())['id']
+    response: ClientResponse = await make_request('/api/v1/roles/', token=token)
+    assert [role['title'] for role in await response.json()] == ['editor']
+
+    await make_request(
+        f'/api/v1/roles/{role_id}/', method='put', data={'title': 'moderator', 'permissions': 2}, token=token
+    )
+    response: ClientResponse = await make_request('/api/v1/roles/', token=token)
+    assert [role['title'] for role in await response.json()] == ['moderator']
+
+    await make_request(f'/api/v1/roles/{role_id}/', method='delete', token=token)
+    response: ClientResponse = await make_request('/api/v1/roles/', token=token)
+    assert await response.json() == []
+
+
+async def test_get_roles_not_modified(aiohttp_session, get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+    url = f'{settings.service_url}/api/v1/roles/'
+    headers = {'Authorization': f'Bearer {token}'}
+
+    async with aiohttp_session.get(url, headers=headers) as response:
+        etag = response.headers['ETag']
+        assert response.status == HTTPStatus.OK
+        assert 'no-cache' in response.headers['Cache-Control']
+
+    async with aiohttp_session.get(url, headers={**headers, 'If-None-Match': etag}) as response:
+        assert response.status == HTTPStatus.NOT_MODIFIED
+        assert response.headers['ETag'] == etag
+
+    await make_request('/api/v1/roles/', method='post', data={'title': 'editor', 'permissions': 1}, token=token)
+    async with aiohttp_session.get(url, headers={**headers, 'If-None-Match': etag}) as response:
+        assert response.status == HTTPStatus.OK
+        assert response.headers['ETag'] != etag
+
+
+async def test_add_role_bulk(async_session: AsyncSession, aiohttp_session, get_token, pg_add_instances):
+    admin, fake_admin = get_user()
+    admin_role, fake_admin_role = get_role()
+    admin_role.title = 'admin'
+    role, fake_role = get_role()
+    users = [get_user() for _ in range(5)]
+    await pg_add_instances([admin, admin_role, role, *[user for user, _ in users]])
+    admin_user_role, _ = get_user_role(fake_admin.id, fake_admin_role.id)
+    await pg_add_instances([admin_user_role])
+    user_ids = [fake_user.id for _, fake_user in users]
+    url = f'{settings.service_url}/api/v1/roles/{fake_role.id}/users/'
+
+    token = await get_token(data={'username': users[0][1].email, 'password': users[0][1].password})
+    async with aiohttp_session.post(
+        url, json={'user_ids': user_ids}, headers={'Authorization': f'Bearer {token}'}
+    ) as response:
+        assert response.status == HTTPStatus.FORBIDDEN
+
+    token = await get_token(data={'username': fake_admin.email, 'password': fake_admin.password})
+    async with aiohttp_session.post(
+        url, json={'user_ids': [*user_ids, user_ids[0], str(uuid.uuid4())]},
+        headers={'Authorization': f'Bearer {token}'}
+    ) as response:
+        assert response.status == HTTPStatus.OK
+        progress = [json.loads(line) for line in (await response.text()).splitlines()]
+
+    assert progress[-1] == {'processed': 6, 'total': 6, 'changed': 5}
+    user_roles = (await async_session.execute(
+        select(UserRole.role_id).where(UserRole.user_id.in_(user_ids))
+    )).scalars().all()
+    assert sorted(map(str, user_roles)) == [fake_role.id] * 5
@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from aiohttp import ClientResponse
+from http import HTTPStatus
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tests.functional.testdata.users import get_user
+
+
+pytestmark = pytest.mark.asyncio
+
+ROUNDS = 5
+REQUESTS_PER_ROUND = 200
+CONCURRENCY = 20
+
+
+async def get_connections(async_session: AsyncSession) -> int:
+    return (await async_session.execute(text(
+        'select count(*) from pg_stat_activity '
+        'where datname = current_database() and pid <> pg_backend_pid()'
+    ))).scalar()
+
+
+async def get_metrics(make_request) -> dict:
+    response: ClientResponse = await make_request('/api/v1/metrics/')
+    return await response.json()
+
+
+async def test_sessions_are_returned_to_pool(
+    async_session: AsyncSession, get_token, make_request, pg_add_instances
+):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def request():
+        async with semaphore:
+            response: ClientResponse = await make_request(f'/api/v1/users/{fake_user.id}/roles/', token=token)
+            assert response.status == HTTPStatus.OK
+
+    observations = []
+    for _ in range(ROUNDS):
+        await asyncio.gather(*[request() for _ in range(REQUESTS_PER_ROUND)])
+        metrics = await get_metrics(make_request)
+        observations.append((
+            await get_connections(async_session),
+            metrics['db_pool']['checked_out'],
+            metrics['process']['max_rss_kb'],
+        ))
+
+    warm_connections, _, warm_rss = observations[0]
+    for connections, checked_out, rss in observations[1:]:
+        assert connections <= warm_connections
+        assert checked_out == 0
+        assert rss - warm_rss < 20 * 1024
@@ -1,11 +1,15 @@
+import csv
+import json
 import pytest
 import uuid
+from datetime import datetime as dt
 from aiohttp import ClientResponse
 from http import HTTPStatus
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from passlib.context import CryptContext
 
+from tests.functional.settings import settings
 from tests.functional.testdata.users import get_user
 from tests.functional.testdata.roles import get_role, get_user_role, UserRole
 
@@ -123,16 +127,16 @@ async def test_delete_user_role(
 
 
 @pytest.mark.parametrize(
-    'page, size, login_count, pages',
+    'size, login_count',
     [
-        (1, 30, 1, 1),
-        (2, 2, 10, 10 / 2),
-        (1, 50, 3, 1),
+        (30, 1),
+        (2, 10),
+        (3, 7),
     ]
 )
 async def test_successfully_get_login_histories(
     get_token, make_request, pg_add_instances,
-    page, size, login_count, pages,
+    size, login_count,
 ):
     user, fake_user = get_user()
     await pg_add_instances([user])
@@ -140,22 +144,48 @@ async def test_successfully_get_login_histories(
     for _ in range(login_count):
         token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
 
-    response: ClientResponse = await make_request(
-        f'/api/v1/users/{fake_user.id}/auth-history/',
-        params={'page': page, 'size': size},
-        token=token
-    )
-    body = await response.json()
+    items, cursor, pages = [], None, 0
+    while True:
+        params = {'size': size, 'with_total': 'true'}
+        if cursor:
+            params['cursor'] = cursor
+        response: ClientResponse = await make_request(
+            f'/api/v1/users/{fake_user.id}/auth-history/', params=params, token=token
+        )
+        body = await response.json()
+
+        assert response.status == HTTPStatus.OK
+        assert body.get('total') == login_count
+        assert body.get('size') == size
+        assert len(body.get('items')) <= size
+        items.extend(body.get('items'))
+        pages += 1
+        cursor = body.get('next_cursor')
+        if not cursor:
+            break
+
+    assert len(items) == login_count
+    assert pages == -(-login_count // size)
+    assert [i['login_time'] for i in items] == sorted((i['login_time'] for i in items), reverse=True)
+    for i in items:
+        assert i['user_id'] == fake_user.id
+
 
+async def test_login_histories_without_total(get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+
+    response: ClientResponse = await make_request(f'/api/v1/users/{fake_user.id}/auth-history/', token=token)
+    body = await response.json()
     assert response.status == HTTPStatus.OK
-    assert body.get('total') == login_count
-    assert body.get('page') == page
-    assert body.get('size') == size
-    assert body.get('pages') == (1 if login_count <= size else login_count / size)
-    assert isinstance(body.get('items'), list)
-    assert len(body.get('items')) == (login_count if size >= login_count else size)
-    for i in body.get('items'):
-        assert i['user_id'] == fake_user.id
+    assert body.get('total') is None
+    assert body.get('next_cursor') is None
+
+    response: ClientResponse = await make_request(
+        f'/api/v1/users/{fake_user.id}/auth-history/', params={'cursor': 'invalid'}, token=token
+    )
+    assert response.status == HTTPStatus.BAD_REQUEST
 
 
 async def test_successfully_update_creds(
@@ -218,3 +248,134 @@ async def test_failed_update_creds(
     )
 
     assert response.status == expected_status
+
+
+async def test_email_is_case_insensitive(get_token, make_request):
+    _, fake_user = get_user()
+    data = {
+        'email': fake_user.email.upper(),
+        'password': fake_user.password,
+        'first_name': fake_user.first_name,
+        'last_name': fake_user.last_name,
+    }
+    response: ClientResponse = await make_request('/api/v1/auth/signup', method='post', data=data)
+    body = await response.json()
+    assert response.status == HTTPStatus.CREATED
+    assert body['email'] == fake_user.email.lower()
+
+    token = await get_token(data={'username': fake_user.email.lower(), 'password': fake_user.password})
+    assert token
+
+    data['email'] = fake_user.email.lower()
+    response: ClientResponse = await make_request('/api/v1/auth/signup', method='post', data=data)
+    assert response.status == HTTPStatus.UNAUTHORIZED
+
+
+async def test_email_lookup_uses_index(async_session: AsyncSession):
+    await async_session.execute(text(
+        "INSERT INTO auth.users (id, email, password, first_name, last_name, disabled, created_at) "
+        "SELECT gen_random_uuid(), 'seed-' || g || '@example.com', 'x', '', '', false, now() "
+        "FROM generate_series(1, 1000000) AS g"
+    ))
+    await async_session.execute(text('ANALYZE auth.users'))
+
+    plan = await async_session.scalars(text(
+        'EXPLAIN SELECT id, password, disabled FROM auth.users WHERE lower(email) = :email'
+    ), {'email': 'seed-500000@example.com'})
+    plan = '\n'.join(plan)
+    await async_session.rollback()
+
+    assert 'users_email_lower_idx' in plan
+    assert 'Seq Scan' not in plan
+
+
+async def test_login_history_is_partitioned_by_month(async_session: AsyncSession):
+    partitions = (await async_session.scalars(text(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        "WHERE parent.relname = 'logins_history'"
+    ))).all()
+    current = f'logins_history_{dt.utcnow():%Y%m}'
+    assert current in partitions
+    assert 'logins_history_default' in partitions
+
+    # страница истории старше текущего месяца не читает его партицию
+    plan = '\n'.join(await async_session.scalars(text(
+        'EXPLAIN SELECT * FROM auth.logins_history '
+        'WHERE user_id = :user_id AND created_at <= :created_at '
+        'ORDER BY created_at DESC, id DESC LIMIT 10'
+    ), {'user_id': uuid.uuid4(), 'created_at': dt(2000, 1, 1)}))
+    assert current not in plan
+
+
+@pytest.mark.parametrize('export_format, gzip', [('ndjson', False), ('csv', True)])
+async def test_export_login_histories(
+    aiohttp_session, get_token, pg_add_instances, export_format, gzip,
+):
+    user, fake_user = get_user()
+    await pg_add_instances([user])
+    for _ in range(3):
+        token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+
+    async with aiohttp_session.get(
+        f'{settings.service_url}/api/v1/users/{fake_user.id}/auth-history/export/',
+        params={'format': export_format, 'gzip': str(gzip).lower()},
+        headers={'Authorization': f'Bearer {token}'},
+    ) as response:
+        assert response.status == HTTPStatus.OK
+        assert (response.headers.get('Content-Encoding') == 'gzip') == gzip
+        body = await response.text()
+
+    lines = body.splitlines()
+    if export_format == 'ndjson':
+        records = [json.loads(line) for line in lines]
+    else:
+        records = list(csv.DictReader(lines))
+    assert len(records) == 3
+    assert all(record['user_id'] == fake_user.id for record in records)
+
+    # время до первого входа отсекает всю историю
+    async with aiohttp_session.get(
+        f'{settings.service_url}/api/v1/users/{fake_user.id}/auth-history/export/',
+        params={'until': '2000-01-01T00:00:00'},
+        headers={'Authorization': f'Bearer {token}'},
+    ) as response:
+        assert response.status == HTTPStatus.OK
+        assert await response.text() == ''
+
+    # время с поясом приводится к UTC, а не обрывает выгрузку
+    async with aiohttp_session.get(
+        f'{settings.service_url}/api/v1/users/{fake_user.id}/auth-history/export/',
+        params={'since': '2000-01-01T00:00:00Z', 'until': '2100-01-01T03:00:00+03:00'},
+        headers={'Authorization': f'Bearer {token}'},
+    ) as response:
+        assert response.status == HTTPStatus.OK
+        assert len((await response.text()).splitlines()) == 3
+
+
+async def test_get_user_role_not_modified(aiohttp_session, get_token, make_request, pg_add_instances):
+    user, fake_user = get_user()
+    role, fake_role = get_role()
+    other_role, fake_other_role = get_role()
+    user_role, _ = get_user_role(fake_user.id, fake_role.id)
+    await pg_add_instances([user, role, other_role])
+    await pg_add_instances([user_role])
+    token = await get_token(data={'username': fake_user.email, 'password': fake_user.password})
+    url = f'{settings.service_url}/api/v1/users/{fake_user.id}/roles/'
+    headers = {'Authorization': f'Bearer {token}'}
+
+    async with aiohttp_session.get(url, headers=headers) as response:
+        etag = response.headers['ETag']
+        assert response.status == HTTPStatus.OK
+        assert (await response.json())['id'] == fake_role.id
+
+    async with aiohttp_session.get(url, headers={**headers, 'If-None-Match': etag}) as response:
+        assert response.status == HTTPStatus.NOT_MODIFIED
+
+    await make_request(
+        f'/api/v1/users/{fake_user.id}/roles/', method='post', data={'role_id': fake_other_role.id}, token=token
+    )
+    async with aiohttp_session.get(url, headers={**headers, 'If-None-Match': etag}) as response:
+        assert response.status == HTTPStatus.OK
+        assert (await response.json())['id'] == fake_other_role.id
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+import fakeredis
+import pytest_asyncio
+
+# Модули сервиса импортируются так же, как при запуске из src
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+
+
+@pytest_asyncio.fixture
+async def cache():
+    client = fakeredis.FakeAsyncRedis()
+    yield client
+    await client.close()
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from services.broadcast import Broadcaster
+
+pytestmark = pytest.mark.asyncio
+
+
+async def wait_for(condition, timeout=2):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+async def publish_until(cache, channel, message, condition):
+    """Публикует, пока сообщение не дойдёт: подписка оформляется в фоне."""
+    async with asyncio.timeout(2):
+        while not condition():
+            await cache.publish(channel, message)
+            await asyncio.sleep(0.02)
+
+
+async def test_failing_handler_does_not_stop_listener(cache):
+    received = []
+
+    async def handler(message):
+        if message == b'bad':
+            raise ValueError('bad message')
+        received.append(message)
+
+    broadcaster = Broadcaster(reconnect_delay=0.01)
+    broadcaster.subscribe('events', handler)
+    await broadcaster.start(cache)
+    try:
+        await publish_until(cache, 'events', 'ready', lambda: received)
+        await cache.publish('events', 'bad')
+        await cache.publish('events', 'good')
+        await wait_for(lambda: b'good' in received)
+    finally:
+        await broadcaster.stop()
+
+
+async def test_failing_resync_reconnects(cache):
+    resyncs, received = [], []
+
+    async def resync():
+        resyncs.append(True)
+        if len(resyncs) == 1:
+            raise RedisTimeoutError('resync timed out')
+
+    async def handler(message):
+        received.append(message)
+
+    broadcaster = Broadcaster(reconnect_delay=0.01)
+    broadcaster.subscribe('events', handler, resync=resync)
+    await broadcaster.start(cache)
+    try:
+        await publish_until(cache, 'events', 'ping', lambda: received)
+        assert len(resyncs) >= 2
+    finally:
+        await broadcaster.stop()
@@ -0,0 +1,12 @@
+from datetime import datetime, timedelta, timezone
+
+from services.export import to_naive_utc
+
+
+def test_to_naive_utc():
+    moscow = timezone(timedelta(hours=3))
+
+    assert to_naive_utc(None) is None
+    assert to_naive_utc(datetime(2024, 1, 1, 12)) == datetime(2024, 1, 1, 12)
+    assert to_naive_utc(datetime(2024, 1, 1, 12, tzinfo=timezone.utc)) == datetime(2024, 1, 1, 12)
+    assert to_naive_utc(datetime(2024, 1, 1, 12, tzinfo=moscow)) == datetime(2024, 1, 1, 9)
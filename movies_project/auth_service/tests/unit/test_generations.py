@@ -0,0 +1,23 @@
+import pytest
+
+from services.generations import bump_generation, generation_key, get_generation, session_generations
+
+pytestmark = pytest.mark.asyncio
+USER_ID = '0190b5c4-7a6e-7d1f-9b2a-3c4d5e6f7a8b'
+
+
+async def test_generation_grows_after_key_expires(cache):
+    first = await bump_generation(cache, USER_ID)
+    assert await cache.ttl(generation_key(USER_ID)) > 0
+
+    await cache.delete(generation_key(USER_ID))
+    session_generations.clear()
+    assert await get_generation(cache, USER_ID) == 0
+
+    # Токены, выданные с поколением first, должны остаться отозванными
+    assert await bump_generation(cache, USER_ID) > first
+
+
+async def test_generation_grows_within_millisecond(cache):
+    generations = [await bump_generation(cache, USER_ID) for _ in range(5)]
+    assert generations == sorted(set(generations))
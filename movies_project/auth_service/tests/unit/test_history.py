@@ -0,0 +1,142 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from services.history import HISTORY_SPILL_KEY, HistoryWriter
+
+pytestmark = pytest.mark.asyncio
+
+
+class StubHistoryWriter(HistoryWriter):
+    """Вместо базы запоминает пачки; записи удалённых пользователей отвергает."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**{'batch_size': 4, 'flush_interval': 60, 'max_backlog': 100,
+                            'spill': False, **kwargs})
+        self.deleted_users = set()
+        self.database_down = False
+        self.stored = []
+
+    async def _write(self, batch):
+        if self.database_down:
+            raise OperationalError('INSERT', {}, ConnectionError('connection refused'))
+        if any(record['user_id'] in self.deleted_users for record in batch):
+            raise IntegrityError('INSERT', {}, Exception('violates foreign key constraint'))
+        self.stored.extend(batch)
+        await self._unspill(batch)
+
+
+async def test_rejected_record_does_not_block_queue():
+    writer = StubHistoryWriter()
+    users = [uuid.uuid4() for _ in range(6)]
+    writer.deleted_users.add(users[2])
+    for user_id in users:
+        await writer.add(user_id)
+
+    assert await writer.flush()
+
+    assert writer.pending == []
+    assert [record['user_id'] for record in writer.stored] == users[:2] + users[3:]
+    assert writer.stats()['rejected'] == 1
+    assert writer.stats()['written'] == 5
+
+
+async def test_transient_error_keeps_batch():
+    writer = StubHistoryWriter()
+    user_id = uuid.uuid4()
+    await writer.add(user_id)
+    writer.database_down = True
+
+    assert not await writer.flush()
+    assert len(writer.pending) == 1
+    assert writer.has_pending(user_id)
+    assert writer.stats()['failed'] == 1
+
+    writer.database_down = False
+    assert await writer.flush()
+    assert writer.pending == []
+    assert writer.stats()['rejected'] == 0
+
+
+async def test_has_pending_tracks_user_records():
+    writer = StubHistoryWriter()
+    user_id, other_id = uuid.uuid4(), uuid.uuid4()
+    await writer.add(user_id)
+    await writer.add(user_id)
+
+    assert writer.has_pending(user_id)
+    assert not writer.has_pending(other_id)
+
+    await writer.flush()
+    assert not writer.has_pending(user_id)
+
+
+async def test_rejected_record_is_removed_from_spill(cache):
+    writer = StubHistoryWriter(spill=True)
+    writer.cache = cache
+    user_id, deleted_id = uuid.uuid4(), uuid.uuid4()
+    writer.deleted_users.add(deleted_id)
+    await writer.add(user_id)
+    await writer.add(deleted_id)
+
+    assert await writer.flush()
+
+    assert await cache.hlen(HISTORY_SPILL_KEY) == 0
+    assert writer.stats()['rejected'] == 1
+
+
+async def test_spill_is_drained_by_one_worker(cache):
+    source = StubHistoryWriter(spill=True)
+    source.cache = cache
+    for _ in range(5):
+        await source.add(uuid.uuid4())
+    workers = [StubHistoryWriter(spill=True) for _ in range(3)]
+
+    await asyncio.gather(*(worker.start(cache) for worker in workers))
+    try:
+        stored = [record['id'] for worker in workers for record in worker.stored]
+        assert sorted(stored) == sorted(record['id'] for record in source.pending)
+        assert await cache.hlen(HISTORY_SPILL_KEY) == 0
+    finally:
+        await asyncio.gather(*(worker.stop() for worker in workers))
+
+
+class SlowHistoryWriter(StubHistoryWriter):
+    """Пачка пишется, пока её не отпустят; параллельные вставки считаются."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _write(self, batch):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            self.started.set()
+            await self.release.wait()
+            await super()._write(batch)
+        finally:
+            self.in_flight -= 1
+
+
+async def test_stop_waits_for_background_flush(cache):
+    writer = SlowHistoryWriter(batch_size=1)
+    await writer.start(cache)
+    task = writer._task
+    await writer.add(uuid.uuid4())
+    await writer.started.wait()
+
+    stopping = asyncio.create_task(writer.stop())
+    await asyncio.sleep(0)
+    writer.release.set()
+    await stopping
+
+    assert task.done()
+    assert writer.pending == []
+    assert writer.max_in_flight == 1
+    assert len(writer.stored) == 1
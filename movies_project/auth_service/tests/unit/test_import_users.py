@@ -0,0 +1,81 @@
+import csv
+
+import pytest
+
+from import_users import COLUMNS, import_rows, prepare_row, read_checkpoint, to_copy_buffer
+from services.passwords import hash_password
+
+VALID_ROW = {'email': ' Ann@Example.com', 'password': 'Password123', 'first_name': 'Ann', 'disabled': 'true'}
+
+
+def test_prepare_row_normalizes_valid_row():
+    row = prepare_row(VALID_ROW, pre_hashed=False)
+
+    assert row['email'] == 'ann@example.com'
+    assert row['password'] == 'Password123'
+    assert row['first_name'] == 'Ann'
+    assert row['last_name'] == ''
+    assert row['disabled'] is True
+    assert set(row) == set(COLUMNS)
+
+
+@pytest.mark.parametrize('changes', [
+    {'email': ''},
+    {'email': 'not-an-email'},
+    {'email': 'a' * 45 + '@example.com'},
+    {'password': ''},
+    {'password': 'short'},
+    {'password': 'p' * 51},
+    {'first_name': 'n' * 51},
+    {'last_name': 'n' * 51},
+    {'disabled': 'maybe'},
+])
+def test_prepare_row_rejects_invalid_row(changes):
+    assert prepare_row({**VALID_ROW, **changes}, pre_hashed=False) is None
+
+
+def test_prepare_row_pre_hashed():
+    hashed = hash_password('Password123')
+
+    assert prepare_row({**VALID_ROW, 'password': hashed}, pre_hashed=True)['password'] == hashed
+    assert prepare_row(VALID_ROW, pre_hashed=True) is None
+
+
+def test_to_copy_buffer_quotes_values():
+    row = prepare_row({**VALID_ROW, 'first_name': 'Ann, "Jr"', 'last_name': None}, pre_hashed=False)
+
+    fields = next(csv.reader(to_copy_buffer([row])))
+
+    assert dict(zip(COLUMNS, fields)) == {
+        'id': str(row['id']),
+        'email': 'ann@example.com',
+        'password': 'Password123',
+        'first_name': 'Ann, "Jr"',
+        'last_name': '',
+        'disabled': 'True',
+        'created_at': str(row['created_at']),
+    }
+
+
+def test_import_resumes_from_checkpoint(tmp_path):
+    checkpoint = tmp_path / 'users.csv.checkpoint'
+    rows = [{'n': n} for n in range(5)]
+    loaded = []
+
+    def failing_load(chunk):
+        if loaded:
+            raise RuntimeError('connection lost')
+        loaded.extend(chunk)
+        return len(chunk), 0
+
+    with pytest.raises(RuntimeError):
+        import_rows(iter(rows), failing_load, checkpoint, chunk_size=2)
+    assert read_checkpoint(checkpoint) == 2
+
+    def load(chunk):
+        loaded.extend(chunk)
+        return len(chunk), 0
+
+    assert import_rows(iter(rows), load, checkpoint, chunk_size=2) == 3
+    assert loaded == rows
+    assert not checkpoint.exists()
@@ -0,0 +1,95 @@
+import os
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+
+import generate_key
+from api import well_known
+from services.keys import KeyRing
+
+PUBLISH_DELAY = 3600
+
+
+def make_key(keys_dir, age: int) -> str:
+    existing = set(keys_dir.iterdir())
+    generate_key.main(algorithm='RS256', keys_dir=str(keys_dir))
+    [path] = set(keys_dir.iterdir()) - existing
+    published_at = time.time() - age
+    os.utime(path, (published_at, published_at))
+    return path.name.removesuffix('.pem')
+
+
+def make_ring(keys_dir, active_kid=None) -> KeyRing:
+    return KeyRing('RS256', secret='', keys_dir=str(keys_dir), active_kid=active_kid, publish_delay=PUBLISH_DELAY)
+
+
+def test_new_key_is_published_before_signing(tmp_path):
+    old_kid = make_key(tmp_path, age=2 * PUBLISH_DELAY)
+    new_kid = make_key(tmp_path, age=60)
+
+    ring = make_ring(tmp_path)
+
+    assert ring.active_kid == old_kid
+    assert {key['kid'] for key in ring.jwks['keys']} == {old_kid, new_kid}
+
+
+def test_key_becomes_active_after_publish_delay(tmp_path):
+    make_key(tmp_path, age=3 * PUBLISH_DELAY)
+    new_kid = make_key(tmp_path, age=PUBLISH_DELAY + 60)
+
+    assert make_ring(tmp_path).active_kid == new_kid
+
+
+def test_first_key_signs_immediately(tmp_path):
+    kid = make_key(tmp_path, age=0)
+
+    assert make_ring(tmp_path).active_kid == kid
+
+
+def test_active_kid_is_pinned(tmp_path):
+    old_kid = make_key(tmp_path, age=3 * PUBLISH_DELAY)
+    make_key(tmp_path, age=2 * PUBLISH_DELAY)
+
+    assert make_ring(tmp_path, active_kid=old_kid).active_kid == old_kid
+
+
+def test_token_of_retired_key_is_verified(tmp_path):
+    old_kid = make_key(tmp_path, age=3 * PUBLISH_DELAY)
+    new_kid = make_key(tmp_path, age=2 * PUBLISH_DELAY)
+    token = make_ring(tmp_path, active_kid=old_kid).sign({'sub': 'user'})
+
+    ring = make_ring(tmp_path)
+
+    assert ring.active_kid == new_kid
+    assert jwt.get_unverified_header(token)['kid'] == old_kid
+    assert ring.verify(token) == {'sub': 'user'}
+    assert jwt.get_unverified_header(ring.sign({'sub': 'user'}))['kid'] == new_kid
+
+
+def test_token_of_removed_key_is_rejected(tmp_path):
+    old_kid = make_key(tmp_path, age=3 * PUBLISH_DELAY)
+    make_key(tmp_path, age=2 * PUBLISH_DELAY)
+    token = make_ring(tmp_path, active_kid=old_kid).sign({'sub': 'user'})
+    os.remove(tmp_path / f'{old_kid}.pem')
+
+    with pytest.raises(jwt.JWTError):
+        make_ring(tmp_path).verify(token)
+
+
+def test_jwks_endpoint(tmp_path, monkeypatch):
+    kid = make_key(tmp_path, age=2 * PUBLISH_DELAY)
+    monkeypatch.setattr(well_known, 'access_keys', make_ring(tmp_path))
+    app = FastAPI()
+    app.include_router(well_known.router, prefix='/.well-known')
+
+    response = TestClient(app).get('/.well-known/jwks.json')
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == f'public, max-age={well_known.config.jwks_max_age}'
+    [key] = response.json()['keys']
+    assert key['kid'] == kid
+    assert key['kty'] == 'RSA'
+    assert 'd' not in key
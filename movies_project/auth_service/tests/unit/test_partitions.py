@@ -0,0 +1,103 @@
+from datetime import date
+
+import pytest
+
+from db.partitions import add_months, create_month_partition, list_month_partitions, maintain_partitions
+
+
+class FakeResult:
+    def __init__(self, rowcount=0):
+        self.rowcount = rowcount
+
+
+class FakeConnection:
+    """Записывает выполненный SQL; содержимое базы задаётся словарями."""
+
+    def __init__(self, partitions=(), default_months=(), failing=()):
+        self.partitions = set(partitions)
+        self.default_months = set(default_months)
+        self.failing = set(failing)
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if any(name in sql for name in self.failing):
+            raise RuntimeError('lock timeout')
+        return FakeResult(rowcount=2)
+
+    def scalar(self, statement, params=None):
+        sql = str(statement)
+        if 'to_regclass' in sql:
+            return params['name'].removeprefix('auth.') in self.partitions
+        if 'pg_try_advisory_lock' in sql:
+            return True
+        return any(f"created_at >= '{month}'" in sql for month in self.default_months)
+
+    def scalars(self, statement, params=None):
+        return [*self.partitions, 'logins_history_default']
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.mark.parametrize('month, months, expected', [
+    (date(2024, 1, 1), 1, date(2024, 2, 1)),
+    (date(2024, 11, 1), 3, date(2025, 2, 1)),
+    (date(2024, 1, 1), -1, date(2023, 12, 1)),
+    (date(2024, 3, 1), -15, date(2022, 12, 1)),
+    (date(2024, 3, 1), 0, date(2024, 3, 1)),
+])
+def test_add_months(month, months, expected):
+    assert add_months(month, months) == expected
+
+
+def test_list_month_partitions_skips_default():
+    connection = FakeConnection(partitions={'logins_history_202402', 'logins_history_202312'})
+
+    assert list_month_partitions(connection) == [date(2023, 12, 1), date(2024, 2, 1)]
+
+
+def test_existing_partition_is_not_recreated():
+    connection = FakeConnection(partitions={'logins_history_202402'})
+
+    assert not create_month_partition(connection, date(2024, 2, 1))
+    assert connection.statements == []
+
+
+def test_empty_default_creates_partition_of():
+    connection = FakeConnection()
+
+    assert create_month_partition(connection, date(2024, 2, 1))
+    assert 'PARTITION OF auth.logins_history' in connection.statements[0]
+
+
+def test_rows_in_default_are_moved_before_attach():
+    connection = FakeConnection(default_months={date(2024, 2, 1)})
+
+    assert create_month_partition(connection, date(2024, 2, 1))
+
+    lock, create, move, attach = connection.statements
+    assert 'LOCK TABLE auth.logins_history_default' in lock
+    assert 'CREATE TABLE auth.logins_history_202402 (LIKE' in create
+    assert 'DELETE FROM auth.logins_history_default' in move
+    assert "created_at < '2024-03-01'" in move
+    assert "ATTACH PARTITION auth.logins_history_202402 FOR VALUES FROM ('2024-02-01') TO ('2024-03-01')" in attach
+
+
+def test_failed_month_does_not_stop_maintenance():
+    connection = FakeConnection(partitions={'logins_history_202301', 'logins_history_202401'},
+                                failing={'logins_history_202403'})
+
+    assert maintain_partitions(connection, date(2024, 2, 15), ahead=2, retention=12)
+
+    assert connection.rollbacks == 1
+    assert any('logins_history_202404' in sql and 'PARTITION OF' in sql for sql in connection.statements)
+    assert any(sql == 'DROP TABLE auth.logins_history_202301' for sql in connection.statements)
+    assert not any('DROP TABLE auth.logins_history_202401' in sql for sql in connection.statements)
+    assert 'pg_advisory_unlock' in connection.statements[-1]
@@ -0,0 +1,60 @@
+import asyncio
+import os
+
+import pytest
+from passlib.hash import bcrypt
+
+from services.passwords import PasswordHasher
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(max_workers=1, max_queue=10)
+    yield hasher
+    hasher.shutdown()
+
+
+async def measure_loop_ticks(coro):
+    """Выполняет coro и считает, сколько раз за это время проснулся event loop."""
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    ticker = asyncio.create_task(tick())
+    try:
+        return await coro, ticks
+    finally:
+        ticker.cancel()
+
+
+async def test_hash_and_verify_run_off_event_loop(hasher):
+    hashed, ticks = await measure_loop_ticks(hasher.hash('password'))
+    assert ticks > 0
+    assert hashed.startswith('$2b$')
+
+    verified, ticks = await measure_loop_ticks(hasher.verify('password', hashed))
+    assert ticks > 0
+    assert verified is True
+    assert await hasher.verify('wrong-password', hashed) is False
+    assert hasher.stats()['pending'] == 0
+
+
+async def test_pool_runs_in_another_process(hasher):
+    loop = asyncio.get_running_loop()
+    hasher.start()
+    assert await loop.run_in_executor(hasher._executor, os.getpid) != os.getpid()
+
+
+@pytest.mark.parametrize('ident', ['2a', '2b'])
+async def test_verify_legacy_hashes(hasher, ident):
+    # Хеши, созданные до пула процессов прямым вызовом passlib
+    legacy = bcrypt.using(ident=ident, rounds=10).hash('legacy-password')
+
+    assert await hasher.verify('legacy-password', legacy) is True
+    assert await hasher.verify('other-password', legacy) is False
@@ -0,0 +1,53 @@
+import uuid
+
+import pytest
+
+from services.permissions import EffectivePermissions, PermissionService, effective_permissions, \
+    invalidate_permissions, permissions_key
+
+pytestmark = pytest.mark.asyncio
+
+
+class RacingPermissionService(PermissionService):
+    """Права пользователя меняются, пока загрузчик читает базу."""
+
+    async def _load(self, versions):
+        await invalidate_permissions(self.cache, list(versions))
+        return {
+            user_id: EffectivePermissions(user_id=user_id, permissions=0b1, version=version)
+            for user_id, version in versions.items()
+        }
+
+
+class StaticPermissionService(PermissionService):
+    async def _load(self, versions):
+        return {
+            user_id: EffectivePermissions(user_id=user_id, permissions=0b11, version=version)
+            for user_id, version in versions.items()
+        }
+
+
+async def test_loaded_permissions_are_cached(cache):
+    user_id = uuid.uuid4()
+    effective_permissions.clear()
+
+    permissions = await StaticPermissionService(None, cache).get_permissions(user_id)
+
+    stored = await cache.hgetall(permissions_key(user_id))
+    assert permissions.permissions == 0b11
+    assert EffectivePermissions.from_cache(user_id, stored).permissions == 0b11
+    assert effective_permissions.get(user_id) == permissions
+
+
+async def test_stale_load_does_not_overwrite_invalidation(cache):
+    user_id = uuid.uuid4()
+    effective_permissions.clear()
+    await invalidate_permissions(cache, [user_id])
+    version = int(await cache.hget(permissions_key(user_id), 'version'))
+
+    await RacingPermissionService(None, cache).get_permissions(user_id)
+
+    stored = await cache.hgetall(permissions_key(user_id))
+    assert b'permissions' not in stored
+    assert int(stored[b'version']) >= version
+    assert effective_permissions.get(user_id) is None
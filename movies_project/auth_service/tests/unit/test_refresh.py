@@ -0,0 +1,57 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from core.config import config
+from services.auth import AuthService
+from services.sessions import create_session, list_sessions
+
+pytestmark = pytest.mark.asyncio
+
+
+class CountingAuthService(AuthService):
+    """Считает загрузки claims: это самая дорогая часть выдачи токенов."""
+
+    claims_loaded = 0
+
+    def __init__(self, cache) -> None:
+        super().__init__(None, cache, None, None)
+
+    async def get_access_claims(self, user_id):
+        self.claims_loaded += 1
+        return {}
+
+
+async def login(service: AuthService, user_id: str) -> str:
+    token, payload = await service.encode_tokens({'sub': user_id})
+    await create_session(service.cache, user_id, payload['sid'], payload['jti'], payload['exp'])
+    return token.refresh_token
+
+
+async def test_refresh_rotates_session(cache):
+    service = CountingAuthService(cache)
+    user_id = str(uuid.uuid4())
+    refresh_token = await login(service, user_id)
+
+    token = await service.refresh_access_token(refresh_token)
+
+    payload = jwt.decode(token.refresh_token, config.secret_key_refresh, algorithms=[config.algorithm])
+    sessions = await list_sessions(cache, user_id)
+    assert [session.id for session in sessions] == [payload['sid']]
+    assert service.claims_loaded == 2
+
+
+async def test_reused_refresh_token_is_rejected_before_signing(cache):
+    service = CountingAuthService(cache)
+    user_id = str(uuid.uuid4())
+    refresh_token = await login(service, user_id)
+    await service.refresh_access_token(refresh_token)
+    loaded = service.claims_loaded
+
+    with pytest.raises(HTTPException):
+        await service.refresh_access_token(refresh_token)
+
+    assert service.claims_loaded == loaded
+    assert await list_sessions(cache, user_id) == []
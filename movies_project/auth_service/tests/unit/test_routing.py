@@ -0,0 +1,75 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import insert, select
+
+from db import postgres
+from db.postgres import RoutingSession
+from models.users import User
+from services import database
+from services.database import email_scope, mark_recent_writes
+from services.users import UserService
+
+replica = SimpleNamespace(sync_engine=object())
+
+
+@pytest.fixture
+def with_replica(monkeypatch):
+    monkeypatch.setattr(postgres, 'replica_engines', [replica])
+    monkeypatch.setattr(database, 'replica_engines', [replica])
+
+
+def test_marked_reads_go_to_replica(with_replica):
+    session = RoutingSession()
+
+    assert session.get_bind(replica=True) is replica.sync_engine
+    assert session.get_bind(clause=select(User).execution_options(replica=True)) is replica.sync_engine
+    assert session.get_bind(clause=select(User)) is postgres.engine.sync_engine
+    assert session.get_bind() is postgres.engine.sync_engine
+
+
+def test_primary_flag_pins_session(with_replica):
+    session = RoutingSession()
+    session.info['primary'] = True
+
+    assert session.get_bind(replica=True) is postgres.engine.sync_engine
+
+
+def test_dml_pins_session(with_replica):
+    session = RoutingSession()
+
+    assert session.get_bind(clause=insert(User)) is postgres.engine.sync_engine
+    assert session.get_bind(replica=True) is postgres.engine.sync_engine
+
+
+def test_flush_pins_session(with_replica):
+    session = RoutingSession()
+    session._flushing = True
+    session.get_bind()
+    session._flushing = False
+
+    assert session.get_bind(replica=True) is postgres.engine.sync_engine
+
+
+def test_without_replicas_everything_goes_to_primary(monkeypatch):
+    monkeypatch.setattr(postgres, 'replica_engines', [])
+    session = RoutingSession()
+
+    assert session.get_bind(replica=True) is postgres.engine.sync_engine
+
+
+class RecordingUserService(UserService):
+    async def _fetch_user(self, query, arg, replica=False):
+        return uuid.uuid4(), 'hash', False
+
+
+@pytest.mark.asyncio
+async def test_email_lookup_after_credentials_change_reads_primary(cache, with_replica):
+    db = SimpleNamespace(info={})
+    await RecordingUserService(db, cache).get_user(email='User@Example.com')
+    assert 'primary' not in db.info
+
+    await mark_recent_writes(cache, [email_scope('user@example.com')])
+    await RecordingUserService(db, cache).get_user(email='User@Example.com')
+    assert db.info['primary'] is True
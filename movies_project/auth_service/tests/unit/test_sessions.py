@@ -0,0 +1,27 @@
+import time
+
+import pytest
+
+from services.sessions import create_session, keep_only_session, list_sessions
+
+pytestmark = pytest.mark.asyncio
+USER_ID = '0190b5c4-7a6e-7d1f-9b2a-3c4d5e6f7a8b'
+
+
+async def test_keep_only_session_removes_other_sessions(cache):
+    expires_at = int(time.time()) + 600
+    for session_id in ['current', 'other-1', 'other-2']:
+        await create_session(cache, USER_ID, session_id, jti=f'{session_id}-jti', expires_at=expires_at)
+
+    assert await keep_only_session(cache, USER_ID, 'current', new_jti='new-jti', expires_at=expires_at + 60)
+
+    sessions = await list_sessions(cache, USER_ID)
+    assert [session.id for session in sessions] == ['current']
+    assert int(sessions[0].expires_at.timestamp()) == expires_at + 60
+
+
+async def test_keep_only_session_without_current_session(cache):
+    await create_session(cache, USER_ID, 'other', jti='jti', expires_at=int(time.time()) + 600)
+
+    assert not await keep_only_session(cache, USER_ID, None, new_jti='new-jti', expires_at=int(time.time()) + 600)
+    assert await list_sessions(cache, USER_ID) == []
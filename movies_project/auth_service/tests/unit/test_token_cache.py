@@ -0,0 +1,81 @@
+import time
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from services import auth
+from services.auth import AuthService, verified_tokens
+from services.cache import TTLCache
+from services.keys import KeyRing
+from services.revocation import RevocationList
+
+
+@pytest.fixture
+def verify_calls(monkeypatch):
+    calls = []
+    verify = KeyRing.verify
+
+    def counting_verify(self, token):
+        calls.append(token)
+        return verify(self, token)
+
+    monkeypatch.setattr(KeyRing, 'verify', counting_verify)
+    return calls
+
+
+@pytest.fixture
+def revoked(monkeypatch, cache):
+    revocations = RevocationList(capacity=100, error_rate=0.01)
+    revocations.cache = cache
+    monkeypatch.setattr(auth, 'revoked_tokens', revocations)
+    return revocations
+
+
+def make_token() -> str:
+    return auth.access_keys.sign({'sub': str(uuid.uuid4()), 'exp': int(time.time()) + 600,
+                                  'jti': uuid.uuid4().hex})
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_skips_verify(cache, verify_calls, revoked):
+    verified_tokens.clear()
+    before = verified_tokens.stats()
+    service = AuthService(None, cache, None, None)
+    token = make_token()
+
+    first = await service.check_access_token(token)
+    second = await service.check_access_token(token)
+
+    assert second == first
+    assert verify_calls == [token]
+    stats = verified_tokens.stats()
+    assert stats['hits'] - before['hits'] == 1
+    assert stats['misses'] - before['misses'] == 1
+
+
+@pytest.mark.asyncio
+async def test_revocation_applies_to_cached_token(cache, verify_calls, revoked):
+    verified_tokens.clear()
+    service = AuthService(None, cache, None, None)
+    token = make_token()
+    principal = await service.check_access_token(token)
+
+    await revoked.revoke(principal.jti, 60)
+
+    with pytest.raises(HTTPException):
+        await service.check_access_token(token)
+    assert verify_calls == [token]
+
+
+def test_entry_does_not_outlive_token():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set('token', 'principal', ttl=0.05)
+    assert cache.get('token') == 'principal'
+
+    time.sleep(0.06)
+    assert cache.get('token') is None
+    assert cache.stats()['misses'] == 1
+
+    cache.set('expired', 'principal', ttl=-1)
+    assert cache.get('expired') is None